@@ -6,34 +6,53 @@ Handles command registration, error handling, and bot lifecycle.
 import os
 import logging
 import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler
 from config import Config
+from models.expense_tracker import ExpenseTracker
 
 logger = logging.getLogger(__name__)
 
+# HTTP/2 lets concurrent Bot API calls share one TLS connection; httpx needs h2 for it
+try:
+    import h2  # noqa: F401
+    TELEGRAM_HTTP_VERSION = "2"
+except ImportError:
+    TELEGRAM_HTTP_VERSION = "1.1"
+
+# Set once the bot thread has finished initializing the application
+bot_ready = threading.Event()
+
 
 def get_webhook_url():
     """Get webhook URL based on environment"""
     if Config.PUBLIC_URL:
-        return f"{Config.PUBLIC_URL}/{Config.BOT_TOKEN}"
+        return f"{Config.PUBLIC_URL}{Config.WEBHOOK_PATH}"
     elif Config.NGROK_URL:
-        return f"{Config.NGROK_URL}/{Config.BOT_TOKEN}"
+        return f"{Config.NGROK_URL}{Config.WEBHOOK_PATH}"
     else:
         # Default to Render hostname
         hostname = os.getenv('RENDER_EXTERNAL_HOSTNAME', 'your-app-name.onrender.com')
-        return f"https://{hostname}/{Config.BOT_TOKEN}"
+        return f"https://{hostname}{Config.WEBHOOK_PATH}"
+
+
+# Environment is fixed for the life of the process
+WEBHOOK_URL = get_webhook_url()
 
 
 async def error_handler(update: Update, context):
     """Enhanced global error handler with timeout handling"""
-    error_msg = str(context.error)
+    error_msg = str(context.error).lower()
     
-    # Log the error with more details
-    logger.error(f"Exception while handling update: {context.error}")
+    # Log lazily with the update id only; the traceback comes from exc_info
+    update_id = update.update_id if isinstance(update, Update) else None
+    logger.error("Exception while handling update %s: %s", update_id, context.error, exc_info=context.error)
     
     # Handle different types of errors
-    if "timed out" in error_msg.lower() or "timeout" in error_msg.lower():
+    if "timed out" in error_msg or "timeout" in error_msg:
         logger.warning("Timeout error detected - user may need to retry")
         
         # Try to send a helpful message to user if possible
@@ -53,7 +72,7 @@ async def error_handler(update: Update, context):
             except Exception as e:
                 logger.error(f"Failed to send timeout message: {e}")
     
-    elif "rate" in error_msg.lower() or "quota" in error_msg.lower():
+    elif "rate" in error_msg or "quota" in error_msg:
         logger.warning("Rate limit or quota error detected")
         
         if update and update.effective_chat:
@@ -68,7 +87,7 @@ async def error_handler(update: Update, context):
             except Exception as e:
                 logger.error(f"Failed to send rate limit message: {e}")
     
-    elif "network" in error_msg.lower() or "connection" in error_msg.lower():
+    elif "network" in error_msg or "connection" in error_msg:
         logger.warning("Network connection error detected")
         
         if update and update.effective_chat:
@@ -85,7 +104,7 @@ async def error_handler(update: Update, context):
     
     else:
         # Generic error
-        logger.error(f"Unhandled error type: {context.error}")
+        logger.error("Unhandled error type: %s", type(context.error).__name__)
         
         if update and update.effective_chat:
             try:
@@ -112,45 +131,21 @@ def create_handler_wrappers(expense_tracker):
         budget_callback_handler, handle_budget_input
     )
     
-    # Command wrappers
-    async def start_wrapper(update: Update, context):
-        await start(update, context, expense_tracker)
-
-    async def help_wrapper(update: Update, context):
-        await help_command(update, context)
-
-    async def login_wrapper(update: Update, context):
-        await login(update, context, expense_tracker)
-
-    async def logout_wrapper(update: Update, context):
-        await logout(update, context, expense_tracker)
-
-    async def expense_wrapper(update: Update, context):
-        await handle_expense(update, context, expense_tracker)
-
-    async def button_wrapper(update: Update, context):
-        await button_callback(update, context, expense_tracker)
-
-    async def summary_wrapper(update: Update, context):
-        await summary_command(update, context, expense_tracker)
-
-    async def balance_wrapper(update: Update, context):
-        await balance_command(update, context, expense_tracker)
-
-    async def sheet_wrapper(update: Update, context):
-        await sheet(update, context, expense_tracker)
-
-    async def budget_wrapper(update: Update, context):
-        await budget_command(update, context)
-
-    async def insights_wrapper(update: Update, context):
-        await insights_command(update, context)
-
-    async def alerts_wrapper(update: Update, context):
-        await alerts_command(update, context)
-
-    async def categories_wrapper(update: Update, context):
-        await categories_command(update, context)
+    # Handlers that need the tracker get it bound as a keyword argument;
+    # the rest are registered directly
+    start_wrapper = partial(start, expense_tracker=expense_tracker)
+    help_wrapper = help_command
+    login_wrapper = partial(login, expense_tracker=expense_tracker)
+    logout_wrapper = partial(logout, expense_tracker=expense_tracker)
+    expense_wrapper = partial(handle_expense, expense_tracker=expense_tracker)
+    button_wrapper = partial(button_callback, expense_tracker=expense_tracker)
+    summary_wrapper = partial(summary_command, expense_tracker=expense_tracker)
+    balance_wrapper = partial(balance_command, expense_tracker=expense_tracker)
+    sheet_wrapper = partial(sheet, expense_tracker=expense_tracker)
+    budget_wrapper = budget_command
+    insights_wrapper = insights_command
+    alerts_wrapper = alerts_command
+    categories_wrapper = categories_command
 
     # Combined handlers
     async def budget_input_wrapper(update: Update, context):
@@ -186,7 +181,7 @@ def create_handler_wrappers(expense_tracker):
     }
 
 
-async def initialize_bot(bot_token, expense_tracker):
+async def initialize_bot(bot_token):
     """Initialize and configure the Telegram bot"""
     try:
         # Create bot application with custom timeout settings
@@ -198,8 +193,15 @@ async def initialize_bot(bot_token, expense_tracker):
                       .pool_timeout(30)      # 30s for connection pool (increased)
                       .get_updates_read_timeout(50)  # 50s for long polling
                       .get_updates_write_timeout(50) # 50s for long polling writes
+                      .http_version(TELEGRAM_HTTP_VERSION)
                       .build())
         
+        # The tracker is built here on the bot thread, instead of as a module global
+        # shared with the Flask thread, and bound into the handlers below. It shares
+        # the /budget handlers' planner, so budgets set there show up in its alerts
+        from handlers.budget_handlers import budget_planner
+        expense_tracker = ExpenseTracker(budget_planner=budget_planner)
+        
         # Create handler wrappers
         handlers = create_handler_wrappers(expense_tracker)
         
@@ -226,14 +228,15 @@ async def initialize_bot(bot_token, expense_tracker):
         # Add error handler
         application.add_error_handler(error_handler)
         
-        # Initialize application
+        # Initialize application; Bot.initialize() issues get_me(), which
+        # also opens the HTTPX connection pool and resolves api.telegram.org
+        # before the first user update arrives
         await application.initialize()
         await application.start()
         
         # Set webhook
-        webhook_url = get_webhook_url()
-        await application.bot.set_webhook(url=webhook_url)
-        logger.info(f"✅ Bot initialized with webhook: {webhook_url}")
+        await application.bot.set_webhook(url=WEBHOOK_URL)
+        logger.info(f"✅ Bot initialized with webhook: {WEBHOOK_URL}")
         
         logger.info("✅ Bot initialized successfully")
         return application
@@ -243,20 +246,31 @@ async def initialize_bot(bot_token, expense_tracker):
         raise
 
 
-def setup_bot_thread(bot_token, expense_tracker, application_callback):
+def setup_bot_thread(bot_token, application_callback):
     """Setup bot in separate thread"""
     try:
+        # Prefer uvloop's faster event loop where it is installed (Linux/macOS)
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            pass
+        
         # Create new event loop for this thread
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         
+        # Blocking Google API calls are offloaded to this pool via asyncio.to_thread
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=32, thread_name_prefix="sheets"))
+        
         # Initialize bot
         application = loop.run_until_complete(
-            initialize_bot(bot_token, expense_tracker)
+            initialize_bot(bot_token)
         )
         
-        # Store application reference
-        application_callback(application)
+        # Store application and loop references
+        application_callback(application, loop)
+        bot_ready.set()
         
         logger.info("🤖 Bot thread started successfully")
         
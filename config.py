@@ -9,6 +9,7 @@ class Config:
     
     # Bot Configuration
     BOT_TOKEN = os.getenv('BOT_TOKEN')
+    WEBHOOK_PATH = f"/{BOT_TOKEN}"
     
     # Google OAuth Configuration
     GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
@@ -30,18 +31,24 @@ class Config:
     PORT = int(os.environ.get('PORT', 8080))
     
     # Timeout Configuration
-    WEBHOOK_TIMEOUT_REGULAR = 8  # seconds for regular operations
-    WEBHOOK_TIMEOUT_OAUTH = 30   # seconds for OAuth operations
     EXPENSE_SAVE_TIMEOUT = 4     # seconds for quick expense save
-    EXPENSE_RETRY_TIMEOUT = 4    # seconds for retry operations
+    EXPENSE_RETRY_TIMEOUT = 4    # extra seconds to wait on a slow save
     
     # File paths
-    USER_CREDENTIALS_FILE = 'user_credentials.pkl'
+    USER_CREDENTIALS_FILE = 'user_credentials.pkl'  # Legacy store, migrated into USER_DATA_DIR on startup
+    USER_DATA_DIR = 'creds'  # One JSON file per user: credentials, spreadsheet ID, balance
+    USER_DATA_SAVE_DELAY = 0.25  # seconds to coalesce writes before flushing to disk
+    USER_BUDGETS_FILE = 'user_budgets.pkl'  # Legacy store, migrated into BUDGET_DB_FILE on startup
+    BUDGET_DB_FILE = 'budgets.db'  # SQLite, one row per (user, category) budget
     
     # Timeout configurations (in seconds)
     GOOGLE_API_TIMEOUT = 30  # Timeout for Google API operations
     TELEGRAM_REQUEST_TIMEOUT = 30  # Timeout for Telegram requests
     SPREADSHEET_CREATION_TIMEOUT = 45  # Longer timeout for spreadsheet creation
+    BOT_STARTUP_TIMEOUT = 30  # Max wait for bot thread initialization
+    SHEETS_HANDLE_TTL = 600  # Reuse opened spreadsheet/worksheet handles for this long
+    SHEETS_CLIENT_CACHE_SIZE = 256  # Most recently active users that keep a gspread client and sheet handles
+    SUMMARY_CACHE_TTL = 60  # Reuse monthly summary totals while no new row was appended
     
     # Categories for expense classification
     CATEGORIES = {
@@ -1,8 +1,10 @@
+import asyncio
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from models.expense_tracker import ExpenseTracker
+from utils.text_utils import looks_like_oauth_code
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +57,7 @@ async def handle_oauth_code(update: Update, context: ContextTypes.DEFAULT_TYPE,
     code = update.message.text.strip()
 
     # Check if this looks like an OAuth code
-    if not (len(code) > 20 and ('/' in code or '-' in code or '_' in code)):
+    if not looks_like_oauth_code(code):
         return False  # Not an OAuth code
 
     loading_msg = await update.message.reply_text("⏳ Memverifikasi kode autorisasi...")
@@ -63,18 +65,17 @@ async def handle_oauth_code(update: Update, context: ContextTypes.DEFAULT_TYPE,
     try:
         # Step 1: Exchange code for credentials
         await loading_msg.edit_text("🔐 Memverifikasi kode autorisasi...")
-        success = expense_tracker.exchange_code_for_credentials(code, user_id)
+        success = await asyncio.to_thread(expense_tracker.exchange_code_for_credentials, code, user_id)
 
         if success:
             # Step 2: Create user's spreadsheet with progress updates
             await loading_msg.edit_text("📁 Membuat folder Budgetin di Google Drive...")
             
             # Add a small delay to show progress
-            import asyncio
             await asyncio.sleep(1)
             
             await loading_msg.edit_text("📊 Membuat Google Sheet baru...")
-            spreadsheet_id = expense_tracker.create_user_spreadsheet(user_id, user_name)
+            spreadsheet_id = await asyncio.to_thread(expense_tracker.create_user_spreadsheet, user_id, user_name)
 
             if spreadsheet_id:
                 await loading_msg.edit_text("✅ Menyiapkan worksheet bulanan...")
@@ -151,14 +152,7 @@ async def logout(update: Update, context: ContextTypes.DEFAULT_TYPE, expense_tra
     """Logout command"""
     user_id = update.effective_user.id
     
-    if str(user_id) in expense_tracker.user_credentials:
-        del expense_tracker.user_credentials[str(user_id)]
-    if str(user_id) in expense_tracker.user_spreadsheets:
-        del expense_tracker.user_spreadsheets[str(user_id)]
-    if str(user_id) in expense_tracker.user_balances:
-        del expense_tracker.user_balances[str(user_id)]
-    
-    expense_tracker.save_user_credentials()
+    expense_tracker.remove_user(user_id)
     
     await update.message.reply_text(
         "✅ Anda telah logout dari Google Account. Gunakan /login untuk masuk kembali."
@@ -191,7 +185,7 @@ async def handle_balance_setup(update: Update, context: ContextTypes.DEFAULT_TYP
         user_name = context.user_data.get('user_name', 'User')
         
         # Get sheet URL
-        spreadsheet_id = expense_tracker.user_spreadsheets.get(str(user_id))
+        spreadsheet_id = expense_tracker.user_spreadsheets.get(user_id)
         sheet_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"
         
         success_text = f"""
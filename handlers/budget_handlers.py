@@ -17,7 +17,7 @@ async def budget_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /budget command - Budget management main menu"""
     try:
         user_id = update.effective_user.id
-        logger.info(f"Budget command called by user {user_id}")
+        logger.info("Budget command called by user %s", user_id)
         
         keyboard = [
             [
@@ -46,7 +46,7 @@ async def budget_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         message += "Pilih menu di bawah ini:"
         
         await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
-        logger.info(f"Budget command completed successfully for user {user_id}")
+        logger.info("Budget command completed successfully for user %s", user_id)
         
     except Exception as e:
         logger.error(f"Error in budget_command: {e}")
@@ -139,7 +139,7 @@ async def budget_callback_handler(update: Update, context: ContextTypes.DEFAULT_
         user_id = update.effective_user.id
         data = query.data
         
-        logger.info(f"Processing budget callback: {data} for user {user_id}")
+        logger.info("Processing budget callback: %s for user %s", data, user_id)
         
         if data == "budget_set":
             await handle_budget_set(query, context)
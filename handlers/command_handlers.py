@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
@@ -5,6 +6,9 @@ from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Worksheets are named per month; nothing before this year can hold expenses
+_MIN_SUMMARY_YEAR = 2000
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE, expense_tracker):
     """Start command handler"""
     user_id = update.effective_user.id
@@ -114,6 +118,7 @@ Kirim pesan dengan format bebas yang mengandung jumlah uang:
 
 📊 *Fitur laporan:*
 • /ringkasan - Ringkasan bulan ini dengan saldo
+• /ringkasan tahun - Ringkasan per bulan tahun ini
 • /balance - Kelola saldo Anda
 • /kategori - Lihat semua kategori
 
@@ -135,14 +140,33 @@ async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE, ex
         )
         return
     
+    # "/ringkasan tahun [YYYY]" summarizes a whole year instead of this month
+    args = context.args or []
+    yearly = bool(args) and args[0].lower() == 'tahun'
+    year = None
+    if yearly and len(args) > 1:
+        year_arg = args[1]
+        if not (len(year_arg) == 4 and year_arg.isascii() and year_arg.isdigit()
+                and int(year_arg) >= _MIN_SUMMARY_YEAR):
+            await update.message.reply_text(
+                "❌ Format tahun tidak valid.\n\n"
+                "💡 *Contoh:* `/ringkasan tahun` atau `/ringkasan tahun 2024`",
+                parse_mode='Markdown'
+            )
+            return
+        year = int(year_arg)
+    
     loading_msg = await update.message.reply_text("⏳ Mengambil ringkasan...")
     
-    summary = expense_tracker.get_monthly_summary(user_id)
+    if yearly:
+        summary = await asyncio.to_thread(expense_tracker.get_yearly_summary, user_id, year)
+    else:
+        summary = await asyncio.to_thread(expense_tracker.get_monthly_summary, user_id)
     
     # Add button to open Google Sheet
     from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     keyboard = []
-    spreadsheet_id = expense_tracker.user_spreadsheets.get(str(user_id))
+    spreadsheet_id = expense_tracker.user_spreadsheets.get(user_id)
     if spreadsheet_id:
         keyboard.append([
             InlineKeyboardButton("📊 Buka Google Sheet", 
@@ -189,7 +213,7 @@ async def sheet(update: Update, context: ContextTypes.DEFAULT_TYPE, expense_trac
         )
         return
     
-    spreadsheet_id = expense_tracker.user_spreadsheets.get(str(user_id))
+    spreadsheet_id = expense_tracker.user_spreadsheets.get(user_id)
     if spreadsheet_id:
         sheet_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"
         keyboard = [[InlineKeyboardButton("📊 Buka Google Sheet", url=sheet_url)]]
@@ -208,7 +232,7 @@ async def sheet(update: Update, context: ContextTypes.DEFAULT_TYPE, expense_trac
 async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE, expense_tracker):
     """Balance command handler"""
     user_id = update.effective_user.id
-    logger.info(f"Balance command called by user {user_id}")
+    logger.info("Balance command called by user %s", user_id)
     
     if not expense_tracker.is_user_authenticated(user_id):
         logger.warning(f"User {user_id} not authenticated for balance command")
@@ -218,14 +242,14 @@ async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE, ex
         return
     
     if not expense_tracker.has_balance_set(user_id):
-        logger.info(f"User {user_id} has no balance set")
+        logger.info("User %s has no balance set", user_id)
         await update.message.reply_text(
             "💰 Anda belum mengatur saldo. Silakan kirim angka saldo Anda untuk memulai."
         )
         return
     
     current_balance = expense_tracker.get_user_balance(user_id)
-    logger.info(f"Balance command successful for user {user_id}, balance: {current_balance}")
+    logger.info("Balance command successful for user %s, balance: %s", user_id, current_balance)
     
     response = f"""
 💳 *Saldo Anda Saat Ini*
@@ -241,7 +265,7 @@ async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE, ex
     keyboard = [
         [InlineKeyboardButton("💰 Isi Saldo", callback_data="add_balance")],
         [InlineKeyboardButton("📊 Buka Google Sheet", 
-         url=f"https://docs.google.com/spreadsheets/d/{expense_tracker.user_spreadsheets.get(str(user_id))}/edit")]
+         url=f"https://docs.google.com/spreadsheets/d/{expense_tracker.user_spreadsheets.get(user_id)}/edit")]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
@@ -1,11 +1,11 @@
+import asyncio
 import logging
-import threading
-import queue
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
+from config import Config
 from utils.text_utils import extract_amount, classify_category, get_description
-from utils.date_utils import format_tanggal_indo, get_month_worksheet_name, get_jakarta_now
+from utils.date_utils import format_tanggal_indo_from_dt, get_month_worksheet_name, get_jakarta_now
 from handlers.auth_handlers import handle_oauth_code, handle_balance_setup
 
 logger = logging.getLogger(__name__)
@@ -81,56 +81,37 @@ async def handle_expense(update: Update, context: ContextTypes.DEFAULT_TYPE, exp
     description = get_description(text, start_pos, end_pos)
     category = classify_category(description)
 
-    # Show loading message
-    loading_msg = await update.message.reply_text("⏳ Menyimpan ke Google Sheet...")
-
     # Quick save operation - focus only on saving to Google Sheets
     success = False
     message = ""
     
     try:
-        import threading
-        import queue
-        
-        def run_quick_save():
-            """Run quick expense save (without heavy smart features)"""
-            try:
-                # Use basic add_expense for speed
-                result = expense_tracker.add_expense(user_id, amount, description, category)
-                result_queue.put(('success', result))
-            except Exception as e:
-                result_queue.put(('error', str(e)))
-        
-        # Create queue for thread communication
-        result_queue = queue.Queue()
-        
-        # Start operation in separate thread
-        operation_thread = threading.Thread(target=run_quick_save)
-        operation_thread.daemon = True
-        operation_thread.start()
-        
-        # Wait for result with quick timeout (optimized for speed)
-        from config import Config
-        operation_thread.join(timeout=Config.EXPENSE_SAVE_TIMEOUT)
-        
-        if operation_thread.is_alive():
-            # Thread is still running - timeout occurred
+        # Quick save in the loop's executor so other updates keep flowing; the
+        # typing indicator is sent concurrently instead of ahead of the write.
+        # The write is shielded: a thread can't be cancelled, so on timeout we keep
+        # waiting on this same write rather than submitting the expense again
+        save_future = asyncio.ensure_future(
+            asyncio.to_thread(expense_tracker.add_expense, user_id, amount, description, category)
+        )
+        save_task = asyncio.wait_for(asyncio.shield(save_future), timeout=Config.EXPENSE_SAVE_TIMEOUT)
+        typing_result, save_result = await asyncio.gather(
+            context.bot.send_chat_action(chat_id=update.effective_chat.id, action='typing'),
+            save_task,
+            return_exceptions=True
+        )
+        if isinstance(typing_result, Exception):
+            logger.warning(f"Failed to send typing action: {typing_result}")
+        try:
+            if isinstance(save_result, BaseException):
+                raise save_result
+            success, message = save_result
+        except asyncio.TimeoutError:
             raise TimeoutError(f"Quick save operation timed out after {Config.EXPENSE_SAVE_TIMEOUT} seconds")
         
-        # Get result from queue
-        if not result_queue.empty():
-            result_type, result_data = result_queue.get()
-            if result_type == 'success':
-                success, message = result_data
-            else:
-                raise Exception(result_data)
-        else:
-            raise Exception("No result received from quick save operation")
-        
         if success:
             # Get current date in Indonesian format for immediate response
             now = get_jakarta_now()
-            tanggal_indo = format_tanggal_indo(now.strftime('%Y-%m-%d'))
+            tanggal_indo = format_tanggal_indo_from_dt(now)
             month_name = get_month_worksheet_name(now.year, now.month)
             current_balance = expense_tracker.get_user_balance(user_id)
 
@@ -182,16 +163,16 @@ async def handle_expense(update: Update, context: ContextTypes.DEFAULT_TYPE, exp
             
             # Add budget suggestion if no budget set for this category
             try:
-                budget_status = expense_tracker.get_budget_status_for_category(user_id, category)
+                budget_status = await asyncio.to_thread(expense_tracker.get_budget_status_for_category, user_id, category)
                 if budget_status.get('status') == 'no_budget':
                     keyboard.append([InlineKeyboardButton("💡 Set Budget", callback_data=f"suggest_budget_{category.replace(' ', '_')}")])
             except Exception:
                 pass  # Skip if budget check fails
             
             reply_markup = InlineKeyboardMarkup(keyboard)
-            await loading_msg.edit_text(response, parse_mode='Markdown', reply_markup=reply_markup)
+            await update.message.reply_text(response, parse_mode='Markdown', reply_markup=reply_markup)
         else:
-            await loading_msg.edit_text(
+            await update.message.reply_text(
                 f"❌ Gagal menyimpan: {message}\n\n"
                 "Pastikan Anda sudah login dan Google Sheet Anda dapat diakses."
             )
@@ -199,56 +180,27 @@ async def handle_expense(update: Update, context: ContextTypes.DEFAULT_TYPE, exp
     except TimeoutError:
         logger.warning(f"Quick save timed out after {Config.EXPENSE_SAVE_TIMEOUT}s for user {user_id}")
         
-        # Retry message - still try to save but with simpler approach
-        await loading_msg.edit_text(
-            "⏳ *Proses lebih lama dari biasanya...*\n\n"
-            "Sedang mencoba ulang...",
-            parse_mode='Markdown'
-        )
+        # Give the write already in flight more time; calling add_expense again
+        # would queue a second row behind it
+        await context.bot.send_chat_action(chat_id=update.effective_chat.id, action='typing')
         
-        # Second attempt with even simpler approach - just save the expense
         try:
-            def run_simple_retry():
-                """Run very simple retry operation"""
-                try:
-                    result = expense_tracker.add_expense(user_id, amount, description, category)
-                    retry_queue.put(('success', result))
-                except Exception as e:
-                    retry_queue.put(('error', str(e)))
-            
-            # Create queue for retry thread communication
-            retry_queue = queue.Queue()
-            
-            # Start retry operation in separate thread
-            retry_thread = threading.Thread(target=run_simple_retry)
-            retry_thread.daemon = True
-            retry_thread.start()
-            
-            # Wait for result with retry timeout
-            retry_thread.join(timeout=Config.EXPENSE_RETRY_TIMEOUT)
-            
-            if retry_thread.is_alive():
-                # Second attempt also timed out
-                raise TimeoutError(f"Second attempt also timed out after {Config.EXPENSE_RETRY_TIMEOUT} seconds")
-            
-            # Get result from retry queue
-            if not retry_queue.empty():
-                result_type, result_data = retry_queue.get()
-                if result_type == 'success':
-                    success, message = result_data
-                else:
-                    raise Exception(result_data)
-            else:
-                raise Exception("No result received from retry operation")
+            try:
+                success, message = await asyncio.wait_for(
+                    asyncio.shield(save_future),
+                    timeout=Config.EXPENSE_RETRY_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Save still running after another {Config.EXPENSE_RETRY_TIMEOUT} seconds")
             
             if success:
-                # Simple success handling for retry
+                # Simple success handling for the slow save
                 now = get_jakarta_now()
-                tanggal_indo = format_tanggal_indo(now.strftime('%Y-%m-%d'))
+                tanggal_indo = format_tanggal_indo_from_dt(now)
                 current_balance = expense_tracker.get_user_balance(user_id)
 
                 response = f"""
-✅ *Pengeluaran berhasil dicatat!* (percobaan ke-2)
+✅ *Pengeluaran berhasil dicatat!*
 
 💰 *Jumlah:* Rp {amount:,}
 📝 *Keterangan:* {description}
@@ -257,17 +209,18 @@ async def handle_expense(update: Update, context: ContextTypes.DEFAULT_TYPE, exp
 💳 *Saldo tersisa:* Rp {current_balance:,}
 """
                 
-                await loading_msg.edit_text(response, parse_mode='Markdown')
+                await update.message.reply_text(response, parse_mode='Markdown')
             else:
-                await loading_msg.edit_text(
-                    f"❌ Gagal menyimpan setelah 2 percobaan: {message}\n\n"
+                await update.message.reply_text(
+                    f"❌ Gagal menyimpan: {message}\n\n"
                     "Pastikan Anda sudah login dan Google Sheet Anda dapat diakses."
                 )
         
         except TimeoutError:
-            logger.error(f"Second attempt also timed out after {Config.EXPENSE_RETRY_TIMEOUT}s for user {user_id}")
-            await loading_msg.edit_text(
-                f"❌ *Operasi gagal setelah 2 percobaan (masing-masing {Config.EXPENSE_RETRY_TIMEOUT} detik)*\n\n"
+            total_wait = Config.EXPENSE_SAVE_TIMEOUT + Config.EXPENSE_RETRY_TIMEOUT
+            logger.error(f"Save still running after {total_wait}s for user {user_id}")
+            await update.message.reply_text(
+                f"❌ *Penyimpanan belum selesai setelah {total_wait} detik*\n\n"
                 "🔧 *Yang bisa Anda lakukan:*\n"
                 "• Tunggu 1-2 menit lalu coba lagi\n"
                 "• Pastikan koneksi internet stabil\n"
@@ -280,9 +233,9 @@ async def handle_expense(update: Update, context: ContextTypes.DEFAULT_TYPE, exp
                 parse_mode='Markdown'
             )
         except Exception as e:
-            logger.error(f"Error in second attempt: {e}")
-            await loading_msg.edit_text(
-                "❌ Terjadi kesalahan pada percobaan kedua.\n\n"
+            logger.error(f"Error in slow save: {e}")
+            await update.message.reply_text(
+                "❌ Terjadi kesalahan saat menyimpan.\n\n"
                 "Silakan coba lagi dalam beberapa menit.",
                 parse_mode='Markdown'
             )
@@ -292,7 +245,7 @@ async def handle_expense(update: Update, context: ContextTypes.DEFAULT_TYPE, exp
         error_str = str(e).lower()
         
         if "timeout" in error_str or "timed out" in error_str:
-            await loading_msg.edit_text(
+            await update.message.reply_text(
                 "⏰ *Operasi timeout*\n\n"
                 "Pencatatan pengeluaran memakan waktu terlalu lama.\n\n"
                 "💡 *Yang bisa Anda lakukan:*\n"
@@ -303,21 +256,21 @@ async def handle_expense(update: Update, context: ContextTypes.DEFAULT_TYPE, exp
                 parse_mode='Markdown'
             )
         elif "quota" in error_str or "rate" in error_str:
-            await loading_msg.edit_text(
+            await update.message.reply_text(
                 "⚠️ *Google API sedang sibuk*\n\n"
                 "Terlalu banyak permintaan dalam waktu singkat.\n"
                 "Silakan tunggu 2-3 menit lalu coba lagi.",
                 parse_mode='Markdown'
             )
         elif "network" in error_str or "connection" in error_str:
-            await loading_msg.edit_text(
+            await update.message.reply_text(
                 "🌐 *Masalah koneksi*\n\n"
                 "Terjadi masalah koneksi jaringan.\n"
                 "Pastikan internet stabil dan coba lagi.",
                 parse_mode='Markdown'
             )
         else:
-            await loading_msg.edit_text(
+            await update.message.reply_text(
                 "❌ Terjadi kesalahan saat memproses pengeluaran.\n\n"
                 "Silakan coba lagi. Jika masalah berlanjut, gunakan /help.",
                 parse_mode='Markdown'
@@ -366,11 +319,11 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, ex
         loading_message = await query.message.reply_text("⏳ Mengambil ringkasan...")
         
         try:
-            summary = expense_tracker.get_monthly_summary(user_id)
+            summary = await asyncio.to_thread(expense_tracker.get_monthly_summary, user_id)
             
             # Add button to open Google Sheet
             keyboard = []
-            spreadsheet_id = expense_tracker.user_spreadsheets.get(str(user_id))
+            spreadsheet_id = expense_tracker.user_spreadsheets.get(user_id)
             if spreadsheet_id:
                 keyboard.append([
                     InlineKeyboardButton("📊 Buka Google Sheet", 
@@ -413,7 +366,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, ex
         keyboard = [
             [InlineKeyboardButton("💰 Isi Saldo", callback_data="add_balance")],
             [InlineKeyboardButton("📊 Buka Google Sheet", 
-             url=f"https://docs.google.com/spreadsheets/d/{expense_tracker.user_spreadsheets.get(str(user_id))}/edit")]
+             url=f"https://docs.google.com/spreadsheets/d/{expense_tracker.user_spreadsheets.get(user_id)}/edit")]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
@@ -430,7 +383,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, ex
         
         try:
             # Get user's recent expenses to provide insights
-            user_expenses = expense_tracker.get_user_expenses_data(user_id, days_back=30)
+            user_expenses = await asyncio.to_thread(expense_tracker.get_user_expenses_data, user_id, days_back=30)
             
             if not user_expenses:
                 await loading_message.edit_text(
@@ -442,8 +395,9 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, ex
             latest_expense = user_expenses[-1]
             
             # Get smart insights without adding another expense
-            smart_insights = expense_tracker.get_smart_insights_for_expense(
-                str(user_id), 
+            smart_insights = await asyncio.to_thread(
+                expense_tracker.get_smart_insights_for_expense,
+                user_id,
                 int(latest_expense.get('amount', 0)),
                 latest_expense.get('description', ''),
                 latest_expense.get('category', '')
@@ -512,15 +466,12 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, ex
         category = query.data.replace("budget_status_", "").replace("_", " ")
         
         try:
-            from models.budget_planner import BudgetPlanner
-            budget_planner = BudgetPlanner()
-            
             # Get budget status for this category
-            budgets = budget_planner.get_user_budgets(user_id)
+            budgets = expense_tracker.budget_planner.get_user_budgets(user_id)
             if category in budgets:
-                budget_amount = budgets[category]
+                budget_amount = budgets[category]['amount']
                 # Get spending for this category this month
-                spent = expense_tracker.get_category_spending_this_month(user_id, category)
+                spent = await asyncio.to_thread(expense_tracker.get_category_spending_this_month, user_id, category)
                 remaining = budget_amount - spent
                 percentage = (spent / budget_amount * 100) if budget_amount > 0 else 0
                 
@@ -549,11 +500,12 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, ex
         category = query.data.replace("suggest_budget_", "").replace("_", " ")
         
         try:
-            from models.budget_planner import BudgetPlanner
-            budget_planner = BudgetPlanner()
-            
-            # Get budget suggestion
-            suggestion = budget_planner.suggest_budget_for_category(user_id, category, expense_tracker)
+            # Same per-category suggestion the /budget menu shows
+            suggestions = expense_tracker.budget_planner.suggest_budget_amounts(user_id)
+            if category in suggestions:
+                suggestion = f"Rp {suggestions[category]:,} per bulan"
+            else:
+                suggestion = "Sesuaikan dengan kebutuhan Anda"
             
             response = f"""
 💡 *Saran Budget: {category}*
@@ -562,7 +514,8 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, ex
 
 Gunakan /budget untuk mengatur budget Anda.
             """
-            await query.message.reply_text(response, parse_mode='Markdown')
+            keyboard = [[InlineKeyboardButton("💰 Set Budget", callback_data=f"set_budget_{category.replace(' ', '_')}")]]
+            await query.message.reply_text(response, parse_mode='Markdown', reply_markup=InlineKeyboardMarkup(keyboard))
         except Exception as e:
             logger.error(f"Error in suggest_budget callback: {e}")
             await query.message.reply_text("❌ Gagal memberikan saran budget.")
@@ -15,12 +15,11 @@ from flask import Flask
 
 # Core imports
 from config import Config
-from models.expense_tracker import ExpenseTracker
 
 # Component imports
 from routes import register_routes
 from webhooks import setup_webhook_handler
-from bot import setup_bot_thread
+from bot import setup_bot_thread, bot_ready
 from utils.app_utils import setup_logging, validate_environment, handle_startup_error
 from utils.config_validator import ConfigValidator
 
@@ -30,13 +29,14 @@ logger = setup_logging()
 # Global variables
 flask_app = Flask(__name__)
 bot_application = None
-expense_tracker = ExpenseTracker()
+bot_loop = None
 
 
-def set_bot_application(application):
-    """Callback to set bot application reference"""
-    global bot_application
+def set_bot_application(application, loop):
+    """Callback to set bot application and event loop references"""
+    global bot_application, bot_loop
     bot_application = application
+    bot_loop = loop
 
 
 def main():
@@ -55,26 +55,30 @@ def main():
         logger.info("✅ Configuration validated")
         
         # Register Flask routes
-        register_routes(flask_app)
+        register_routes(flask_app, (is_valid, config_errors))
         logger.info("✅ Flask routes registered")
         
         # Setup webhook handler
-        setup_webhook_handler(flask_app, Config.BOT_TOKEN, lambda: bot_application)
+        setup_webhook_handler(flask_app, Config.WEBHOOK_PATH, lambda: bot_application, lambda: bot_loop)
         logger.info("✅ Webhook handler configured")
         
         # Start bot in separate thread
         bot_thread = threading.Thread(
             target=setup_bot_thread, 
-            args=(Config.BOT_TOKEN, expense_tracker, set_bot_application),
+            args=(Config.BOT_TOKEN, set_bot_application),
             daemon=True
         )
         bot_thread.start()
+        
+        # Wait until the bot is initialized before accepting webhooks
+        if not bot_ready.wait(timeout=Config.BOT_STARTUP_TIMEOUT):
+            raise RuntimeError(f"Bot initialization did not finish within {Config.BOT_STARTUP_TIMEOUT}s")
         logger.info("✅ Bot thread started")
         
         # Start Flask server
         logger.info(f"🌐 Starting Flask server on port {Config.PORT}...")
         print(f"\n🤖 Budgetin Bot is running!")
-        print(f"📡 Webhook endpoint: http://localhost:{Config.PORT}/{Config.BOT_TOKEN}")
+        print(f"📡 Webhook endpoint: http://localhost:{Config.PORT}{Config.WEBHOOK_PATH}")
         print(f"🌐 Health check: http://localhost:{Config.PORT}/")
         print(f"📊 OAuth callback: http://localhost:{Config.PORT}/oauth/callback")
         print(f"\n✅ Bot is ready to receive messages!")
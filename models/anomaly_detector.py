@@ -1,17 +1,61 @@
+import bisect
 import logging
-import statistics
+import math
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
-from collections import defaultdict
+from collections import Counter, OrderedDict, defaultdict
 from utils.date_utils import get_jakarta_now
 
 logger = logging.getLogger(__name__)
 
+def median(values):
+    """Median of a non-empty list of numbers"""
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2
+
+def sample_stdev(values, mean):
+    """Sample standard deviation around a precomputed mean, 0 for fewer than two values"""
+    if len(values) < 2:
+        return 0
+    return math.sqrt(sum((value - mean) ** 2 for value in values) / (len(values) - 1))
+
 class AnomalyDetector:
     """Detect unusual spending patterns"""
     
+    # Pattern cache bounds
+    PATTERN_CACHE_TTL = 60  # seconds
+    PATTERN_CACHE_SIZE = 1024
+    
     def __init__(self):
-        self.spending_history = {}  # Cache for user spending patterns
+        # (user_id, count, last expense) -> (computed_at, patterns), oldest first; shared by
+        # concurrent insight calls running in executor threads, hence the lock
+        self._pattern_cache = OrderedDict()
+        self._pattern_lock = threading.Lock()
+    
+    def get_expense_patterns(self, user_id: int, user_expenses: List[Dict]) -> Dict:
+        """analyze_expense_patterns, memoized while the user's history is unchanged"""
+        last = user_expenses[-1] if user_expenses else {}
+        cache_key = (user_id, len(user_expenses),
+                     last.get('amount'), last.get('date'), last.get('time'), last.get('description'))
+        now = time.time()
+        with self._pattern_lock:
+            cached = self._pattern_cache.get(cache_key)
+        if cached and now - cached[0] < self.PATTERN_CACHE_TTL:
+            return cached[1]
+        
+        patterns = self.analyze_expense_patterns(user_expenses)
+        with self._pattern_lock:
+            # Re-inserting moves the key to the end, so the front is always the oldest entry
+            self._pattern_cache.pop(cache_key, None)
+            self._pattern_cache[cache_key] = (now, patterns)
+            while len(self._pattern_cache) > self.PATTERN_CACHE_SIZE:
+                self._pattern_cache.popitem(last=False)
+        return patterns
     
     def analyze_expense_patterns(self, user_expenses: List[Dict]) -> Dict:
         """Analyze user's historical expense patterns"""
@@ -24,21 +68,24 @@ class AnomalyDetector:
         # Group by category
         category_amounts = defaultdict(list)
         daily_totals = defaultdict(int)
-        hourly_patterns = defaultdict(list)
+        active_hours = set()  # detect_time_anomaly only asks whether an hour was seen
+        
+        default_date = datetime.now().strftime('%Y-%m-%d')
         
         for expense in user_expenses:
             category = expense.get('category', 'Other')
             amount = expense['amount']
-            date = expense.get('date', datetime.now().strftime('%Y-%m-%d'))
-            time = expense.get('time', '12:00:00')
+            time_str = expense.get('time', '12:00:00')
             
             category_amounts[category].append(amount)
-            daily_totals[date] += amount
+            daily_totals[expense.get('date', default_date)] += amount
             
-            # Extract hour for pattern analysis
+            # Extract hour for pattern analysis; sheet times are always HH:MM:SS
+            if time_str[2:3] == ':' and time_str[:2].isdigit():
+                active_hours.add(int(time_str[:2]))
+                continue
             try:
-                hour = int(time.split(':')[0])
-                hourly_patterns[hour].append(amount)
+                active_hours.add(int(time_str.split(':')[0]))
             except:
                 pass
         
@@ -46,10 +93,11 @@ class AnomalyDetector:
         category_stats = {}
         for category, amounts in category_amounts.items():
             if len(amounts) >= 3:  # Need at least 3 data points
+                mean = sum(amounts) / len(amounts)
                 category_stats[category] = {
-                    'mean': statistics.mean(amounts),
-                    'median': statistics.median(amounts),
-                    'stdev': statistics.stdev(amounts) if len(amounts) > 1 else 0,
+                    'mean': mean,
+                    'median': median(amounts),
+                    'stdev': sample_stdev(amounts, mean),
                     'min': min(amounts),
                     'max': max(amounts),
                     'count': len(amounts)
@@ -57,17 +105,18 @@ class AnomalyDetector:
         
         # Daily spending patterns
         daily_amounts = list(daily_totals.values())
+        daily_mean = sum(daily_amounts) / len(daily_amounts) if daily_amounts else 0
         daily_stats = {
-            'mean': statistics.mean(daily_amounts) if daily_amounts else 0,
-            'median': statistics.median(daily_amounts) if daily_amounts else 0,
-            'stdev': statistics.stdev(daily_amounts) if len(daily_amounts) > 1 else 0
+            'mean': daily_mean,
+            'median': median(daily_amounts) if daily_amounts else 0,
+            'stdev': sample_stdev(daily_amounts, daily_mean)
         }
         
         return {
             'has_enough_data': True,
             'category_stats': category_stats,
             'daily_stats': daily_stats,
-            'hourly_patterns': dict(hourly_patterns),
+            'hourly_patterns': active_hours,
             'total_transactions': len(user_expenses)
         }
     
@@ -126,10 +175,8 @@ class AnomalyDetector:
         
         try:
             hour = int(expense_time.split(':')[0])
-            hourly_patterns = user_patterns.get('hourly_patterns', {})
-            
             # Check if user typically doesn't spend at this hour
-            hours_with_activity = list(hourly_patterns.keys())
+            hours_with_activity = user_patterns.get('hourly_patterns', set())
             
             if not hours_with_activity:
                 return None
@@ -152,7 +199,7 @@ class AnomalyDetector:
         
         return None
     
-    def detect_frequency_anomaly(self, user_id: str, recent_expenses: List[Dict], time_window_hours: int = 24) -> Optional[Dict]:
+    def detect_frequency_anomaly(self, user_id: int, recent_expenses: List[Dict], time_window_hours: int = 24) -> Optional[Dict]:
         """Detect unusual spending frequency"""
         if len(recent_expenses) < 5:
             return None
@@ -160,33 +207,25 @@ class AnomalyDetector:
         now = get_jakarta_now()
         window_start = now - timedelta(hours=time_window_hours)
         
-        # Count transactions in the time window
-        recent_transactions = []
-        for expense in recent_expenses:
-            expense_time = expense.get('datetime', now)
-            # Handle timezone differences
-            if expense_time.tzinfo is None and now.tzinfo is not None:
-                expense_time = expense_time.replace(tzinfo=now.tzinfo)
-            elif expense_time.tzinfo is not None and now.tzinfo is None:
-                expense_time = expense_time.replace(tzinfo=None)
-                window_start = window_start.replace(tzinfo=None)
-                
-            if expense_time >= window_start:
-                recent_transactions.append(expense)
+        # Expenses arrive in chronological order with Jakarta-aware datetimes
+        # (normalized at ingest), so the window is a suffix
+        times = [expense.get('datetime', now) for expense in recent_expenses]
+        recent_transactions = recent_expenses[bisect.bisect_left(times, window_start):]
         
         transaction_count = len(recent_transactions)
         
         # Alert if too many transactions in short time
         if transaction_count >= 8:  # 8+ transactions in 24 hours
+            total_amount = sum(t['amount'] for t in recent_transactions)
             return {
                 'type': 'frequency_anomaly',
                 'transaction_count': transaction_count,
                 'time_window': time_window_hours,
-                'total_amount': sum(t['amount'] for t in recent_transactions),
+                'total_amount': total_amount,
                 'message': f"📊 *Frekuensi Pengeluaran Tinggi*\n\n"
                           f"Anda telah melakukan {transaction_count} transaksi "
                           f"dalam {time_window_hours} jam terakhir.\n"
-                          f"Total: Rp {sum(t['amount'] for t in recent_transactions):,}\n\n"
+                          f"Total: Rp {total_amount:,}\n\n"
                           f"Periksa apakah semua transaksi ini benar! 🤔",
                 'severity': 'medium'
             }
@@ -201,36 +240,27 @@ class AnomalyDetector:
         now = get_jakarta_now()
         recent_cutoff = now - timedelta(days=recent_days)
         
-        # Separate recent vs historical expenses
-        recent_expenses = []
-        historical_expenses = []
-        
-        for expense in user_expenses:
-            expense_date = expense.get('datetime', now)
-            # Handle timezone differences
-            if expense_date.tzinfo is None and now.tzinfo is not None:
-                expense_date = expense_date.replace(tzinfo=now.tzinfo)
-            elif expense_date.tzinfo is not None and now.tzinfo is None:
-                expense_date = expense_date.replace(tzinfo=None)
-                recent_cutoff = recent_cutoff.replace(tzinfo=None)
-                
-            if expense_date >= recent_cutoff:
-                recent_expenses.append(expense)
-            else:
-                historical_expenses.append(expense)
+        # Separate recent vs historical expenses (chronological, so one split point)
+        times = [expense.get('datetime', now) for expense in user_expenses]
+        split = bisect.bisect_left(times, recent_cutoff)
+        recent_expenses = user_expenses[split:]
+        historical_expenses = user_expenses[:split]
         
         if len(recent_expenses) < 3 or len(historical_expenses) < 10:
             return None
         
         # Calculate category distributions
         def get_category_distribution(expenses):
-            category_totals = defaultdict(int)
-            total_amount = sum(e['amount'] for e in expenses)
-            
+            category_totals = Counter()
+            total_amount = 0
             for expense in expenses:
-                category_totals[expense.get('category', 'Other')] += expense['amount']
+                amount = expense['amount']
+                category_totals[expense.get('category', 'Other')] += amount
+                total_amount += amount
             
             # Convert to percentages
+            if not total_amount:
+                return {}
             return {cat: (amount / total_amount * 100) for cat, amount in category_totals.items()}
         
         recent_dist = get_category_distribution(recent_expenses)
@@ -270,9 +300,9 @@ class AnomalyDetector:
         
         return None
     
-    def get_comprehensive_anomaly_report(self, user_id: str, user_expenses: List[Dict], new_expense: Dict) -> Dict:
+    def get_comprehensive_anomaly_report(self, user_id: int, user_expenses: List[Dict], new_expense: Dict) -> Dict:
         """Generate comprehensive anomaly detection report"""
-        user_patterns = self.analyze_expense_patterns(user_expenses)
+        user_patterns = self.get_expense_patterns(user_id, user_expenses)
         
         anomalies = []
         
@@ -1,5 +1,8 @@
 import logging
 import pickle
+import sqlite3
+import threading
+from functools import lru_cache
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 from config import Config
@@ -7,99 +10,155 @@ from utils.date_utils import get_jakarta_now
 
 logger = logging.getLogger(__name__)
 
+# Default suggestions based on average Indonesian spending patterns
+_DEFAULT_BUDGET_SUGGESTIONS = {
+    'Daily Needs': 2000000,  # 2M for food and daily necessities
+    'Transportation': 800000,  # 800K for transportation
+    'Utilities': 500000,     # 500K for utilities
+    'Entertainment': 600000,  # 600K for entertainment
+    'Health': 300000,        # 300K for health
+    'Urgent': 200000         # 200K for urgent expenses
+}
+
+@lru_cache(maxsize=4096)
+def _compute_status(spent_amount: int, budget_amount: int, alert_threshold: int) -> Tuple[str, str, float, int]:
+    """Compute budget status, message, percentage spent and remaining amount"""
+    # Calculate percentage spent
+    percentage_spent = (spent_amount / budget_amount) * 100 if budget_amount > 0 else 0
+    remaining = max(0, budget_amount - spent_amount)
+    
+    # Determine status
+    if percentage_spent >= 100:
+        status = 'exceeded'
+        message = f"⚠️ Budget exceeded! Spent: Rp {spent_amount:,} / Budget: Rp {budget_amount:,}"
+    elif percentage_spent >= alert_threshold:
+        status = 'warning'
+        message = f"🔸 Budget warning! Spent: Rp {spent_amount:,} ({percentage_spent:.1f}%) of Rp {budget_amount:,}"
+    else:
+        status = 'safe'
+        message = f"✅ Budget safe. Spent: Rp {spent_amount:,} ({percentage_spent:.1f}%) of Rp {budget_amount:,}"
+    
+    return status, message, percentage_spent, remaining
+
 class BudgetPlanner:
     """Budget Planning and Management System"""
     
+    # Config.CATEGORIES is static, so the display names are built once
+    _ALL_CATEGORIES = tuple(sorted(key.replace('_', ' ').title() for key in Config.CATEGORIES))
+    
     def __init__(self):
-        self.user_budgets = {}  # {user_id: {category: budget_amount}}
-        self.budget_periods = {}  # {user_id: {category: 'monthly'/'weekly'}}
-        self.budget_alerts = {}  # {user_id: {category: alert_threshold_percentage}}
+        # In-memory cache of the budgets table, filled per user on first access
+        self.budgets = {}  # {user_id: {category: {'amount', 'period', 'alert_threshold'}}}
+        
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(Config.BUDGET_DB_FILE, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # user_id has TEXT affinity: int Telegram IDs are stored and matched as their decimal string
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS budgets ("
+            "user_id TEXT, category TEXT, amount INTEGER, period TEXT, alert INTEGER, "
+            "PRIMARY KEY (user_id, category))"
+        )
         self.load_budget_data()
     
-    def save_budget_data(self):
-        """Save budget data to file"""
-        try:
-            budget_data = {
-                'budgets': self.user_budgets,
-                'periods': self.budget_periods,
-                'alerts': self.budget_alerts
-            }
-            with open('user_budgets.pkl', 'wb') as f:
-                pickle.dump(budget_data, f)
-        except Exception as e:
-            logger.error(f"Error saving budget data: {e}")
-    
     def load_budget_data(self):
-        """Load budget data from file"""
+        """Import the legacy pickle file into the budgets table once"""
+        # user_version records that the import ran, so deleting every budget later
+        # doesn't bring the pickled ones back on the next start
+        with self._db_lock:
+            if self._db.execute("PRAGMA user_version").fetchone()[0] >= 1:
+                return
+            if self._db.execute("SELECT 1 FROM budgets LIMIT 1").fetchone():
+                # Migrated before the version was recorded
+                self._db.execute("PRAGMA user_version = 1")
+                return
         try:
-            with open('user_budgets.pkl', 'rb') as f:
+            with open(Config.USER_BUDGETS_FILE, 'rb') as f:
                 data = pickle.load(f)
-                self.user_budgets = data.get('budgets', {})
-                self.budget_periods = data.get('periods', {})
-                self.budget_alerts = data.get('alerts', {})
         except FileNotFoundError:
-            pass
+            with self._db_lock:
+                self._db.execute("PRAGMA user_version = 1")
+            return
         except Exception as e:
             logger.error(f"Error loading budget data: {e}")
+            return
+        
+        budgets = data.get('budgets', {})
+        periods = data.get('periods', {})
+        alerts = data.get('alerts', {})
+        rows = [
+            (user_id, category, amount,
+             periods.get(user_id, {}).get(category, 'monthly'),
+             alerts.get(user_id, {}).get(category, 80))
+            for user_id, categories in budgets.items()
+            for category, amount in categories.items()
+        ]
+        with self._db_lock:
+            self._db.executemany("INSERT OR REPLACE INTO budgets VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.execute("PRAGMA user_version = 1")
+        logger.info(f"Migrated {len(rows)} budgets from {Config.USER_BUDGETS_FILE}")
+    
+    def _ensure_user_loaded(self, user_id: int):
+        """Fill the in-memory cache for user from the budgets table"""
+        if user_id in self.budgets:
+            return
+        # Check and fill under the lock: a late filler must not overwrite a budget
+        # another thread already wrote into a freshly filled cache entry
+        with self._db_lock:
+            if user_id in self.budgets:
+                return
+            rows = self._db.execute(
+                "SELECT category, amount, period, alert FROM budgets WHERE user_id = ?", (user_id,)
+            ).fetchall()
+            self.budgets[user_id] = {
+                category: {'amount': amount, 'period': period, 'alert_threshold': alert}
+                for category, amount, period, alert in rows
+            }
     
-    def set_category_budget(self, user_id: str, category: str, amount: int, period: str = 'monthly', alert_threshold: int = 80):
+    def set_category_budget(self, user_id: int, category: str, amount: int, period: str = 'monthly', alert_threshold: int = 80):
         """Set budget for specific category"""
-        user_id = str(user_id)
+        self._ensure_user_loaded(user_id)
         
-        # Initialize user data if not exists
-        if user_id not in self.user_budgets:
-            self.user_budgets[user_id] = {}
-            self.budget_periods[user_id] = {}
-            self.budget_alerts[user_id] = {}
+        self.budgets[user_id][category] = {'amount': amount, 'period': period, 'alert_threshold': alert_threshold}
         
-        self.user_budgets[user_id][category] = amount
-        self.budget_periods[user_id][category] = period
-        self.budget_alerts[user_id][category] = alert_threshold
-        
-        self.save_budget_data()
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO budgets VALUES (?, ?, ?, ?, ?)",
+                    (user_id, category, amount, period, alert_threshold)
+                )
+        except Exception as e:
+            logger.error(f"Error saving budget data: {e}")
         return True
     
-    def get_user_budgets(self, user_id: str) -> Dict[str, Dict]:
+    def get_user_budgets(self, user_id: int) -> Dict[str, Dict]:
         """Get all budgets for a user"""
-        user_id = str(user_id)
-        budgets = self.user_budgets.get(user_id, {})
-        periods = self.budget_periods.get(user_id, {})
-        alerts = self.budget_alerts.get(user_id, {})
-        
-        result = {}
-        for category in budgets:
-            result[category] = {
-                'amount': budgets[category],
-                'period': periods.get(category, 'monthly'),
-                'alert_threshold': alerts.get(category, 80)
-            }
-        
-        return result
+        self._ensure_user_loaded(user_id)
+        return {category: dict(info) for category, info in self.budgets[user_id].items()}
     
-    def get_category_budget(self, user_id: str, category: str) -> Optional[Dict]:
+    def get_category_budget(self, user_id: int, category: str) -> Optional[Dict]:
         """Get budget for specific category"""
-        user_budgets = self.get_user_budgets(user_id)
-        return user_budgets.get(category)
+        self._ensure_user_loaded(user_id)
+        info = self.budgets[user_id].get(category)
+        return dict(info) if info else None
     
-    def remove_category_budget(self, user_id: str, category: str) -> bool:
+    def remove_category_budget(self, user_id: int, category: str) -> bool:
         """Remove budget for specific category"""
-        user_id = str(user_id)
+        self._ensure_user_loaded(user_id)
         
-        if user_id in self.user_budgets and category in self.user_budgets[user_id]:
-            del self.user_budgets[user_id][category]
+        if category in self.budgets[user_id]:
+            del self.budgets[user_id][category]
             
-            if user_id in self.budget_periods and category in self.budget_periods[user_id]:
-                del self.budget_periods[user_id][category]
-                
-            if user_id in self.budget_alerts and category in self.budget_alerts[user_id]:
-                del self.budget_alerts[user_id][category]
-            
-            self.save_budget_data()
+            try:
+                with self._db_lock:
+                    self._db.execute("DELETE FROM budgets WHERE user_id = ? AND category = ?", (user_id, category))
+            except Exception as e:
+                logger.error(f"Error saving budget data: {e}")
             return True
         
         return False
     
-    def get_budget_status(self, user_id: str, category: str, spent_amount: int, period_start: datetime = None) -> Dict:
+    def get_budget_status(self, user_id: int, category: str, spent_amount: int, period_start: datetime = None) -> Dict:
         """Get budget status for category"""
         budget_info = self.get_category_budget(user_id, category)
         if not budget_info:
@@ -107,21 +166,7 @@ class BudgetPlanner:
         
         budget_amount = budget_info['amount']
         alert_threshold = budget_info['alert_threshold']
-        
-        # Calculate percentage spent
-        percentage_spent = (spent_amount / budget_amount) * 100 if budget_amount > 0 else 0
-        remaining = max(0, budget_amount - spent_amount)
-        
-        # Determine status
-        if percentage_spent >= 100:
-            status = 'exceeded'
-            message = f"⚠️ Budget exceeded! Spent: Rp {spent_amount:,} / Budget: Rp {budget_amount:,}"
-        elif percentage_spent >= alert_threshold:
-            status = 'warning'
-            message = f"🔸 Budget warning! Spent: Rp {spent_amount:,} ({percentage_spent:.1f}%) of Rp {budget_amount:,}"
-        else:
-            status = 'safe'
-            message = f"✅ Budget safe. Spent: Rp {spent_amount:,} ({percentage_spent:.1f}%) of Rp {budget_amount:,}"
+        status, message, percentage_spent, remaining = _compute_status(spent_amount, budget_amount, alert_threshold)
         
         return {
             'status': status,
@@ -135,24 +180,12 @@ class BudgetPlanner:
     
     def get_all_categories_from_config(self) -> List[str]:
         """Get all available categories from config"""
-        categories = []
-        for category_key in Config.CATEGORIES.keys():
-            category_name = category_key.replace('_', ' ').title()
-            categories.append(category_name)
-        return sorted(categories)
+        return list(self._ALL_CATEGORIES)
     
-    def suggest_budget_amounts(self, user_id: str, monthly_income: int = None) -> Dict[str, int]:
+    def suggest_budget_amounts(self, user_id: int, monthly_income: int = None) -> Dict[str, int]:
         """Suggest budget amounts based on common ratios"""
         if not monthly_income:
-            # Default suggestions based on average Indonesian spending patterns
-            suggestions = {
-                'Daily Needs': 2000000,  # 2M for food and daily necessities
-                'Transportation': 800000,  # 800K for transportation
-                'Utilities': 500000,     # 500K for utilities
-                'Entertainment': 600000,  # 600K for entertainment
-                'Health': 300000,        # 300K for health
-                'Urgent': 200000         # 200K for urgent expenses
-            }
+            suggestions = dict(_DEFAULT_BUDGET_SUGGESTIONS)
         else:
             # Calculate based on income (using 50/30/20 rule adapted for Indonesian context)
             suggestions = {
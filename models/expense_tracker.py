@@ -1,19 +1,25 @@
 import logging
-import hashlib
+import secrets
 import gspread
+from gspread.utils import absolute_range_name
+import requests
+from requests.adapters import HTTPAdapter
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 import pickle
+import os
+import atexit
+import threading
 from datetime import datetime, timedelta
 import calendar
+from collections import Counter, OrderedDict
 import time
 from typing import Dict, List, Tuple, Optional
 
 from config import Config
-from utils.date_utils import get_month_worksheet_name, format_tanggal_indo, get_jakarta_now
+from utils.date_utils import get_month_worksheet_name, parse_month_worksheet_name, parse_tanggal_indo, format_tanggal_indo_from_dt, get_jakarta_now, ensure_jakarta_aware
 from utils.error_handlers import retry_on_error, GoogleSheetsErrorHandler, rate_limiter, validate_user_input
+from utils.json_utils import json_dumps, json_loads
 
 # Import new models
 from models.budget_planner import BudgetPlanner
@@ -23,12 +29,47 @@ from models.spending_analytics import SpendingAnalytics
 
 logger = logging.getLogger(__name__)
 
+# Token refreshes share one pooled session so the TLS connection to Google is reused
+_google_auth_session = requests.Session()
+_google_auth_session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=10))
+_google_auth_request = Request(session=_google_auth_session)
+
+# Request payload pieces that never change, built once instead of per worksheet/expense
+_SHEET_HEADERS = ('Tanggal', 'Waktu', 'Jumlah', 'Keterangan', 'Kategori', 'Notes', 'Saldo')
+_HEADER_FORMAT = {
+    "backgroundColor": {"red": 0.2, "green": 0.6, "blue": 0.9},
+    "textFormat": {"bold": True, "foregroundColor": {"red": 1, "green": 1, "blue": 1}}
+}
+_HEADER_ROW = {"values": [
+    {"userEnteredValue": {"stringValue": header}, "userEnteredFormat": _HEADER_FORMAT}
+    for header in _SHEET_HEADERS
+]}
+_SOLID_BORDER = {"style": "SOLID", "width": 1}
+_ROW_BORDER_FORMAT = {"userEnteredFormat": {"borders": {
+    "top": _SOLID_BORDER, "bottom": _SOLID_BORDER, "left": _SOLID_BORDER, "right": _SOLID_BORDER
+}}}
+
+def _border_data_rows_request(sheet_id):
+    """repeatCell request bordering every row below the header, so appended rows need no formatting"""
+    return {
+        "repeatCell": {
+            "range": {
+                "sheetId": sheet_id,
+                "startRowIndex": 1,
+                "startColumnIndex": 0,
+                "endColumnIndex": len(_SHEET_HEADERS)
+            },
+            "cell": _ROW_BORDER_FORMAT,
+            "fields": "userEnteredFormat.borders"
+        }
+    }
+
 class ExpenseTracker:
     """
     Enhanced Budgetin with OAuth 2.0 support for user-specific Google Sheets
     Now includes Budget Planning, Smart Alerts, Anomaly Detection, and Analytics
     """
-    def __init__(self):
+    def __init__(self, budget_planner: Optional[BudgetPlanner] = None):
         # OAuth 2.0 configuration
         self.oauth_config = {
             'client_id': Config.GOOGLE_CLIENT_ID,
@@ -36,66 +77,182 @@ class ExpenseTracker:
             'redirect_uri': Config.OAUTH_REDIRECT_URI,
             'scopes': Config.OAUTH_SCOPES
         }
+        self._client_config = {
+            'web': {
+                'client_id': self.oauth_config['client_id'],
+                'client_secret': self.oauth_config['client_secret'],
+                'auth_uri': 'https://accounts.google.com/o/oauth2/auth',
+                'token_uri': 'https://oauth2.googleapis.com/token',
+                'redirect_uris': [self.oauth_config['redirect_uri']]
+            }
+        }
         
-        # Store user credentials in memory (in production, use database)
+        # Store user credentials in memory, persisted per user under Config.USER_DATA_DIR
         self.user_credentials = {}
         self.user_spreadsheets = {}  # Store spreadsheet IDs per user
         self.user_balances = {}  # Store user balances
+        self._authed_users = set()  # Users holding both credentials and a spreadsheet
+        self._budgetin_folder_ids = {}  # Drive ID of each user's 'Budgetin' folder
+        self._refresh_locks = {}  # user_id -> Lock held while refreshing the user's token
+        
+        # Debounced persistence: users changed since the last flush
+        self._dirty_users = set()
+        self._save_lock = threading.Lock()
+        self._save_timer = None
+        # Held from snapshot to rename, so flushes (timer, atexit) never share a tmp file
+        # or let an older snapshot replace a newer one
+        self._flush_lock = threading.Lock()
+        
+        # Successful row writes per monthly worksheet in this process; versions the read caches
+        # below, and a month missing here hasn't been written (or created) by this process yet
+        self._write_counts = {}  # (user_id, year, month) -> batches written
+        
+        # Authorized gspread client per user, reused while the credentials object is unchanged;
+        # only the Config.SHEETS_CLIENT_CACHE_SIZE most recently active users keep one
+        self._gc_cache = OrderedDict()  # user_id -> (Credentials, Client), least recently used first
+        self._gc_lock = threading.Lock()
+        
+        # Opened gspread handles, reused until Config.SHEETS_HANDLE_TTL expires
+        self._spreadsheet_cache = {}  # user_id -> (Spreadsheet, opened_at)
+        self._ws_cache = {}  # (user_id, year, month) -> (Worksheet, opened_at)
+        self._summary_cache = {}  # (user_id, year, month) -> (write_count, fetched_at, total, count, categories)
+        self._expenses_cache = {}  # (user_id, year, month) -> (write_count, fetched_at, parsed expenses)
+        
+        # Group commit of expense rows: rows queued while a write is in flight go out together
+        self._pending_rows = {}  # (user_id, year, month) -> [{'row', 'done', 'error'}, ...]
+        self._pending_lock = threading.Lock()
+        self._write_locks = {}  # (user_id, year, month) -> Lock held during a write
         
         # For duplicate detection
         self.recent_expenses = {}  # user_id -> [(amount, description, timestamp), ...]
         
-        # Initialize new smart features
-        self.budget_planner = BudgetPlanner()
+        # Initialize new smart features. The planner caches budgets per user, so
+        # /budget must write through this same instance for alerts to see changes
+        self.budget_planner = budget_planner or BudgetPlanner()
         self.alert_system = SmartAlertSystem(self.budget_planner)
         self.anomaly_detector = AnomalyDetector()
         self.analytics = SpendingAnalytics()
         
         # Load saved credentials if exists
         self.load_user_credentials()
+        self._authed_users = set(self.user_credentials) & set(self.user_spreadsheets)
+        atexit.register(self.flush_user_data)
 
-    def save_user_credentials(self):
-        """Save user credentials to file"""
-        try:
-            with open(Config.USER_CREDENTIALS_FILE, 'wb') as f:
-                pickle.dump({
-                    'credentials': self.user_credentials,
-                    'spreadsheets': self.user_spreadsheets,
-                    'balances': self.user_balances
-                }, f)
-        except Exception as e:
-            logger.error(f"Error saving credentials: {e}")
+    def _mark_dirty(self, user_id):
+        """Schedule user's data to be written, coalescing bursts of changes into one write"""
+        with self._save_lock:
+            self._dirty_users.add(user_id)
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(Config.USER_DATA_SAVE_DELAY, self.flush_user_data)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush_user_data(self):
+        """Write every dirty user's file now"""
+        with self._flush_lock:
+            with self._save_lock:
+                dirty_users, self._dirty_users = self._dirty_users, set()
+                self._save_timer = None
+                records = {user_id: self._user_record(user_id) for user_id in dirty_users}
+            self._write_user_records(records)
+
+    def _write_user_records(self, records):
+        """Atomically replace each user's file with its snapshot; call with _flush_lock held"""
+        if records:
+            os.makedirs(Config.USER_DATA_DIR, exist_ok=True)
+        for user_id, record in records.items():
+            path = os.path.join(Config.USER_DATA_DIR, f"{user_id}.json")
+            try:
+                if record is None:
+                    if os.path.exists(path):
+                        os.remove(path)
+                    continue
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(json_dumps(record))
+                    # Make sure the data is on disk before it is renamed into place
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.error(f"Error saving data for user {user_id}: {e}")
+
+    def _user_record(self, user_id):
+        """Serializable snapshot of one user's data, or None if nothing is stored"""
+        creds = self.user_credentials.get(user_id)
+        spreadsheet_id = self.user_spreadsheets.get(user_id)
+        balance = self.user_balances.get(user_id)
+        folder_id = self._budgetin_folder_ids.get(user_id)
+        if creds is None and spreadsheet_id is None and balance is None and folder_id is None:
+            return None
+        return {
+            'credentials': json_loads(creds.to_json()) if creds else None,
+            'spreadsheet_id': spreadsheet_id,
+            'balance': balance,
+            'folder_id': folder_id
+        }
 
     def load_user_credentials(self):
-        """Load user credentials from file"""
+        """Load user credentials from the per-user files, migrating the legacy pickle once"""
+        try:
+            filenames = os.listdir(Config.USER_DATA_DIR)
+        except FileNotFoundError:
+            self._migrate_legacy_credentials()
+            return
+        
+        for filename in filenames:
+            if not filename.endswith('.json'):
+                continue
+            try:
+                user_id = int(filename[:-len('.json')])
+            except ValueError:
+                continue
+            try:
+                with open(os.path.join(Config.USER_DATA_DIR, filename), 'rb') as f:
+                    record = json_loads(f.read())
+                if record.get('credentials'):
+                    self.user_credentials[user_id] = Credentials.from_authorized_user_info(record['credentials'])
+                if record.get('spreadsheet_id'):
+                    self.user_spreadsheets[user_id] = record['spreadsheet_id']
+                if record.get('balance') is not None:
+                    self.user_balances[user_id] = record['balance']
+                if record.get('folder_id'):
+                    self._budgetin_folder_ids[user_id] = record['folder_id']
+            except Exception as e:
+                logger.error(f"Error loading data for user {user_id}: {e}")
+
+    def _migrate_legacy_credentials(self):
+        """Import the old single-pickle store into per-user files"""
         try:
             with open(Config.USER_CREDENTIALS_FILE, 'rb') as f:
                 data = pickle.load(f)
-                self.user_credentials = data.get('credentials', {})
-                self.user_spreadsheets = data.get('spreadsheets', {})
-                self.user_balances = data.get('balances', {})
         except FileNotFoundError:
-            pass
+            return
         except Exception as e:
-            logger.error(f"Error loading credentials: {e}")
+            logger.error(f"Error loading legacy credentials: {e}")
+            return
+        
+        # The pickle keyed users by str(user_id); Telegram IDs are ints
+        self.user_credentials = {int(user_id): creds for user_id, creds in data.get('credentials', {}).items()}
+        self.user_spreadsheets = {int(user_id): sid for user_id, sid in data.get('spreadsheets', {}).items()}
+        self.user_balances = {int(user_id): balance for user_id, balance in data.get('balances', {}).items()}
+        migrated_users = set(self.user_credentials) | set(self.user_spreadsheets) | set(self.user_balances)
+        self._dirty_users.update(migrated_users)
+        self.flush_user_data()
+        logger.info(f"Migrated {len(migrated_users)} users from {Config.USER_CREDENTIALS_FILE}")
 
     def get_oauth_url(self, user_id):
         """Generate OAuth authorization URL for user"""
         try:
-            flow = Flow.from_client_config({
-                'web': {
-                    'client_id': self.oauth_config['client_id'],
-                    'client_secret': self.oauth_config['client_secret'],
-                    'auth_uri': 'https://accounts.google.com/o/oauth2/auth',
-                    'token_uri': 'https://oauth2.googleapis.com/token',
-                    'redirect_uris': [self.oauth_config['redirect_uri']]
-                }
-            }, scopes=self.oauth_config['scopes'])
+            # oauthlib is only needed during /login; keep it off the import path of every worker
+            from google_auth_oauthlib.flow import Flow
+
+            flow = Flow.from_client_config(self._client_config, scopes=self.oauth_config['scopes'])
             
             flow.redirect_uri = self.oauth_config['redirect_uri']
             
-            # Generate state with user_id for security
-            state = f"{user_id}_{hashlib.md5(str(user_id).encode()).hexdigest()[:8]}"
+            # Unguessable per-request state; the caller keeps it alongside the user
+            state = secrets.token_urlsafe(16)
             
             auth_url, _ = flow.authorization_url(
                 access_type='offline',
@@ -111,22 +268,17 @@ class ExpenseTracker:
     def exchange_code_for_credentials(self, code, user_id):
         """Exchange authorization code for credentials"""
         try:
-            flow = Flow.from_client_config({
-                'web': {
-                    'client_id': self.oauth_config['client_id'],
-                    'client_secret': self.oauth_config['client_secret'],
-                    'auth_uri': 'https://accounts.google.com/o/oauth2/auth',
-                    'token_uri': 'https://oauth2.googleapis.com/token',
-                    'redirect_uris': [self.oauth_config['redirect_uri']]
-                }
-            }, scopes=self.oauth_config['scopes'])
+            from google_auth_oauthlib.flow import Flow
+
+            flow = Flow.from_client_config(self._client_config, scopes=self.oauth_config['scopes'])
             
             flow.redirect_uri = self.oauth_config['redirect_uri']
             flow.fetch_token(code=code)
             
             # Store credentials
-            self.user_credentials[str(user_id)] = flow.credentials
-            self.save_user_credentials()
+            self.user_credentials[user_id] = flow.credentials
+            self._update_auth_state(user_id)
+            self._mark_dirty(user_id)
             
             return True
         except Exception as e:
@@ -135,16 +287,62 @@ class ExpenseTracker:
 
     def get_user_credentials(self, user_id):
         """Get stored credentials for user"""
-        creds = self.user_credentials.get(str(user_id))
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-                self.save_user_credentials()
-            except Exception as e:
-                logger.error(f"Error refreshing credentials: {e}")
-                return None
+        creds = self.user_credentials.get(user_id)
+        # valid covers both an expired token and a missing one (e.g. loaded without an access token)
+        if creds and not creds.valid and creds.refresh_token:
+            # One refresh per user at a time; other users' refreshes are not held up
+            with self._refresh_locks.setdefault(user_id, threading.Lock()):
+                # A concurrent caller may have refreshed while we waited
+                if creds.valid:
+                    return creds
+                try:
+                    creds.refresh(_google_auth_request)
+                    self._mark_dirty(user_id)
+                except Exception as e:
+                    logger.error(f"Error refreshing credentials: {e}")
+                    self.invalidate_user_cache(user_id)
+                    return None
         return creds
 
+    def _get_gspread_client(self, user_id, creds):
+        """Get the user's authorized gspread client, authorizing again only for new credentials"""
+        with self._gc_lock:
+            cached = self._gc_cache.get(user_id)
+            if cached and cached[0] is creds:
+                self._gc_cache.move_to_end(user_id)
+                return cached[1]
+        
+        gc = gspread.authorize(creds)
+        with self._gc_lock:
+            self._gc_cache[user_id] = (creds, gc)
+            self._gc_cache.move_to_end(user_id)
+            idle_users = list(self._gc_cache)[:-Config.SHEETS_CLIENT_CACHE_SIZE]
+        
+        # Idle users give up their client, its HTTP session and their cached sheet handles
+        for idle_user in idle_users:
+            self.invalidate_user_cache(idle_user)
+        return gc
+
+    def invalidate_user_cache(self, user_id):
+        """Drop cached spreadsheet/worksheet handles, write counts and idle write locks for user"""
+        # The refresh lock stays: a caller may have fetched it from setdefault and not yet
+        # acquired it, and a fresh lock for the next caller would let two refreshes overlap.
+        # It is one Lock per user with credentials, like user_credentials itself
+        with self._gc_lock:
+            self._gc_cache.pop(user_id, None)
+        self._spreadsheet_cache.pop(user_id, None)
+        for cache in (self._ws_cache, self._write_counts, self._summary_cache, self._expenses_cache):
+            for key in [key for key in list(cache) if key[0] == user_id]:
+                cache.pop(key, None)
+        
+        # Write locks are handed out under _pending_lock together with the queued row,
+        # so a lock with no queued rows that isn't held has no one about to use it
+        with self._pending_lock:
+            for key in [key for key in self._write_locks if key[0] == user_id]:
+                if not self._pending_rows.get(key) and not self._write_locks[key].locked():
+                    del self._write_locks[key]
+                    self._pending_rows.pop(key, None)
+
     @retry_on_error(max_retries=3, delay=3.0, timeout_delay=8.0)
     def create_user_spreadsheet(self, user_id, user_name):
         """Create a new spreadsheet for user in their Google Drive, inside 'Budgetin' folder with timeout handling"""
@@ -153,43 +351,35 @@ class ExpenseTracker:
             if not creds:
                 return None
 
-            gc = gspread.authorize(creds)
-            drive_service = build('drive', 'v3', credentials=creds)  # Gunakan Google Drive API
-
-            # 1. Cari folder 'Budgetin' di My Drive user, jika tidak ada maka buat
-            folder_name = "Budgetin"
-            folder_id = None
-            results = drive_service.files().list(
-                q=f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false",
-                spaces='drive',
-                fields="files(id, name)"
-            ).execute()
-            folders = results.get('files', [])
-            if folders:
-                folder_id = folders[0]['id']
-            else:
-                file_metadata = {
-                    'name': folder_name,
-                    'mimeType': 'application/vnd.google-apps.folder'
-                }
-                folder = drive_service.files().create(body=file_metadata, fields='id').execute()
-                folder_id = folder.get('id')
+            # Drive is only needed here, once per account; keep its heavy import off startup
+            from googleapiclient.discovery import build
+            
+            gc = self._get_gspread_client(user_id, creds)
+            drive_service = build('drive', 'v3', credentials=creds, cache_discovery=False, static_discovery=True)  # Gunakan Google Drive API
+
+            # 1. Cari folder 'Budgetin' di My Drive user (sekali saja per user), jika tidak ada maka buat
+            cached_folder_id = self._budgetin_folder_ids.get(user_id)
+            folder_id = cached_folder_id or self._find_or_create_budgetin_folder(drive_service, user_id)
 
             # 2. Buat spreadsheet di root, lalu pindahkan ke folder
             spreadsheet_title = f"Budgetin - {user_name}"
             spreadsheet = gc.create(spreadsheet_title)
 
             # Pindahkan file ke folder
-            drive_service.files().update(
-                fileId=spreadsheet.id,
-                addParents=folder_id,
-                removeParents='root',
-                fields='id, parents'
-            ).execute()
+            try:
+                self._move_to_folder(drive_service, spreadsheet.id, folder_id)
+            except Exception:
+                if not cached_folder_id:
+                    raise
+                # Cached folder may have been deleted since; look it up again
+                folder_id = self._find_or_create_budgetin_folder(drive_service, user_id)
+                self._move_to_folder(drive_service, spreadsheet.id, folder_id)
 
             # Store spreadsheet ID
-            self.user_spreadsheets[str(user_id)] = spreadsheet.id
-            self.save_user_credentials()
+            self.user_spreadsheets[user_id] = spreadsheet.id
+            self._update_auth_state(user_id)
+            self.invalidate_user_cache(user_id)
+            self._mark_dirty(user_id)
 
             # Setup initial worksheet for current month
             self.setup_monthly_worksheet(user_id, datetime.now().year, datetime.now().month)
@@ -201,55 +391,147 @@ class ExpenseTracker:
             logger.error(f"Error creating spreadsheet for user {user_id}: {e}")
             return None        
         
+    def _find_or_create_budgetin_folder(self, drive_service, user_id):
+        """Find the user's 'Budgetin' Drive folder, creating it if missing, and remember its ID"""
+        folder_name = "Budgetin"
+        escaped_name = folder_name.replace('\\', '\\\\').replace("'", "\\'")
+        results = drive_service.files().list(
+            # Only the user's own folder counts; a shared 'Budgetin' folder must not match
+            q=f"mimeType='application/vnd.google-apps.folder' and name='{escaped_name}' and 'me' in owners and trashed=false",
+            spaces='drive',
+            pageSize=1,
+            fields="files(id)"
+        ).execute()
+        folders = results.get('files', [])
+        if folders:
+            folder_id = folders[0]['id']
+        else:
+            file_metadata = {
+                'name': folder_name,
+                'mimeType': 'application/vnd.google-apps.folder'
+            }
+            folder = drive_service.files().create(body=file_metadata, fields='id').execute()
+            folder_id = folder.get('id')
+        
+        self._budgetin_folder_ids[user_id] = folder_id
+        self._mark_dirty(user_id)
+        return folder_id
+
+    def _move_to_folder(self, drive_service, file_id, folder_id):
+        """Move a Drive file from My Drive root into folder"""
+        drive_service.files().update(
+            fileId=file_id,
+            addParents=folder_id,
+            removeParents='root',
+            fields='id, parents'
+        ).execute()
+
     def get_user_spreadsheet(self, user_id):
         """Get user's spreadsheet, create if doesn't exist"""
-        spreadsheet_id = self.user_spreadsheets.get(str(user_id))
+        spreadsheet_id = self.user_spreadsheets.get(user_id)
         if not spreadsheet_id:
             return None
+        
+        cached = self._spreadsheet_cache.get(user_id)
+        if cached and cached[0].id == spreadsheet_id and time.time() - cached[1] < Config.SHEETS_HANDLE_TTL:
+            return cached[0]
             
         try:
             creds = self.get_user_credentials(user_id)
             if not creds:
                 return None
                 
-            gc = gspread.authorize(creds)
-            return gc.open_by_key(spreadsheet_id)
+            gc = self._get_gspread_client(user_id, creds)
+            spreadsheet = gc.open_by_key(spreadsheet_id)
+            self._spreadsheet_cache[user_id] = (spreadsheet, time.time())
+            return spreadsheet
         except Exception as e:
             logger.error(f"Error accessing spreadsheet for user {user_id}: {e}")
             return None
 
+    def get_month_worksheet(self, user_id, year, month):
+        """Get existing worksheet for specific month without creating it; None if missing"""
+        ws_key = (user_id, year, month)
+        cached = self._ws_cache.get(ws_key)
+        if cached and time.time() - cached[1] < Config.SHEETS_HANDLE_TTL:
+            return cached[0]
+        
+        spreadsheet = self.get_user_spreadsheet(user_id)
+        if not spreadsheet:
+            return None
+        
+        # Looking up one worksheet fetches the whole sheet list anyway, so cache every month from it
+        self._ws_cache.pop(ws_key, None)
+        self._cache_month_worksheets(user_id, spreadsheet)
+        cached = self._ws_cache.get(ws_key)
+        return cached[0] if cached else None
+
+    def _cache_month_worksheets(self, user_id, spreadsheet):
+        """List spreadsheet's worksheets in one request and cache every monthly one"""
+        worksheets = spreadsheet.worksheets()
+        opened_at = time.time()
+        for ws in worksheets:
+            year_month = parse_month_worksheet_name(ws.title)
+            if year_month:
+                self._ws_cache[(user_id, *year_month)] = (ws, opened_at)
+        return worksheets
+
     def setup_monthly_worksheet(self, user_id, year, month):
         """Setup worksheet for specific month"""
+        ws_key = (user_id, year, month)
         try:
+            # Try to get existing worksheet
+            ws = self.get_month_worksheet(user_id, year, month)
+            if ws:
+                return ws
+            
             spreadsheet = self.get_user_spreadsheet(user_id)
             if not spreadsheet:
                 return None
                 
             ws_name = get_month_worksheet_name(year, month)
             
-            # Try to get existing worksheet
-            try:
-                ws = spreadsheet.worksheet(ws_name)
-                return ws
-            except gspread.exceptions.WorksheetNotFound:
-                # Create new worksheet
-                ws = spreadsheet.add_worksheet(ws_name, rows=1000, cols=7)
-                
-                # Add headers
-                headers = ['Tanggal', 'Waktu', 'Jumlah', 'Keterangan', 'Kategori', 'Notes', 'Saldo']
-                ws.update('A1:G1', [headers])
-                
-                # Format headers
-                ws.format('A1:G1', {
-                    "backgroundColor": {"red": 0.2, "green": 0.6, "blue": 0.9},
-                    "textFormat": {"bold": True, "foregroundColor": {"red": 1, "green": 1, "blue": 1}}
-                })
-                
-                # Set column widths
-                ws.columns_auto_resize(0, 6)
-                
-                return ws
-                
+            # Create the sheet, write and format headers, border the data rows, then size
+            # columns, in one request; the sheetId is picked here so the later requests can refer to it
+            sheet_id = secrets.randbelow(2**31 - 1) + 1
+            response = spreadsheet.batch_update({
+                "requests": [
+                    {
+                        "addSheet": {
+                            "properties": {
+                                "sheetId": sheet_id,
+                                "title": ws_name,
+                                "gridProperties": {"rowCount": 1000, "columnCount": 7}
+                            }
+                        }
+                    },
+                    {
+                        "updateCells": {
+                            "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+                            "rows": [_HEADER_ROW],
+                            "fields": "userEnteredValue,userEnteredFormat(backgroundColor,textFormat)"
+                        }
+                    },
+                    _border_data_rows_request(sheet_id),
+                    {
+                        "autoResizeDimensions": {
+                            "dimensions": {
+                                "sheetId": sheet_id,
+                                "dimension": "COLUMNS",
+                                "startIndex": 0,
+                                "endIndex": len(_SHEET_HEADERS)
+                            }
+                        }
+                    }
+                ]
+            })
+            properties = response['replies'][0]['addSheet']['properties']
+            ws = gspread.Worksheet(spreadsheet, properties, spreadsheet.id, spreadsheet.client)
+            
+            self._write_counts[ws_key] = 0
+            self._ws_cache[ws_key] = (ws, time.time())
+            return ws
+            
         except Exception as e:
             logger.error(f"Error setting up monthly worksheet: {e}")
             return None
@@ -284,31 +566,28 @@ class ExpenseTracker:
             if not ws:
                 return False, "Could not access your Google Sheet. Please login again."
             
-            # Update balance
-            new_balance = self.subtract_balance(user_id, amount)
-            
             # Prepare row data
-            date_str = format_tanggal_indo(now.strftime('%Y-%m-%d'))
+            date_str = format_tanggal_indo_from_dt(now)
             time_str = now.strftime('%H:%M:%S')
-            row = [date_str, time_str, amount, description, category, '', new_balance]
+            count_key = (user_id, now.year, now.month)
+            entry = {'row': None, 'done': False, 'error': None}
             
-            # Add to worksheet with retry mechanism
-            self._append_row_with_retry(ws, row)
+            with self._pending_lock:
+                # Balance update and queue position are taken together so rows land in balance order
+                new_balance = self.subtract_balance(user_id, amount)
+                entry['row'] = [date_str, time_str, amount, description, category, '', new_balance]
+                self._pending_rows.setdefault(count_key, []).append(entry)
+                write_lock = self._write_locks.setdefault(count_key, threading.Lock())
             
-            # Format the new row
-            try:
-                last_row = len(ws.get_all_values())
-                ws.format(f'A{last_row}:G{last_row}', {
-                    "borders": {
-                        "top": {"style": "SOLID", "width": 1},
-                        "bottom": {"style": "SOLID", "width": 1},
-                        "left": {"style": "SOLID", "width": 1},
-                        "right": {"style": "SOLID", "width": 1}
-                    }
-                })
-            except Exception as format_error:
-                # Formatting error shouldn't fail the entire operation
-                logger.warning(f"Failed to format row: {format_error}")
+            # Group commit: whoever holds the worksheet's write lock writes every row
+            # queued so far, so rows that arrive during a write share the next request
+            with write_lock:
+                if not entry['done']:
+                    with self._pending_lock:
+                        batch = self._pending_rows.pop(count_key, [])
+                    self._write_pending_rows(ws, count_key, batch)
+            if entry['error'] is not None:
+                raise entry['error']
             
             # Record this expense for duplicate detection
             self._record_expense_for_duplicate_check(user_id, amount, description, now)
@@ -320,12 +599,52 @@ class ExpenseTracker:
             success, error_message = GoogleSheetsErrorHandler.handle_api_error(e)
             return success, error_message
     
+    def _write_pending_rows(self, ws, count_key, batch):
+        """Write a batch of queued expense rows and mark every entry done (or failed)"""
+        try:
+            # New worksheets are bordered at creation; sheets made before that get the
+            # same one-off border with their first append in this process
+            first_write = count_key not in self._write_counts
+            
+            # Append in a single request, with retry mechanism
+            self._append_rows_with_retry(ws, [entry['row'] for entry in batch], border_sheet=first_write)
+            self._write_counts[count_key] = self._write_counts.get(count_key, 0) + 1
+        except Exception as e:
+            # The sheet may have been edited or removed by hand, or the write may have partly
+            # landed; re-open it and re-read the month next time
+            self._ws_cache.pop(count_key, None)
+            self._summary_cache.pop(count_key, None)
+            self._expenses_cache.pop(count_key, None)
+            for entry in batch:
+                entry['error'] = e
+        finally:
+            for entry in batch:
+                entry['done'] = True
+
     @retry_on_error(max_retries=3, delay=2.0, timeout_delay=5.0)
-    def _append_row_with_retry(self, worksheet, row):
-        """Append row to worksheet with enhanced retry mechanism and timeout handling"""
+    def _append_rows_with_retry(self, worksheet, rows, border_sheet=False):
+        """Append rows in one batchUpdate with enhanced retry mechanism and timeout handling"""
+        row_data = [
+            {"values": [
+                {"userEnteredValue": {"numberValue": value} if isinstance(value, (int, float)) else {"stringValue": str(value)}}
+                for value in row
+            ]}
+            for row in rows
+        ]
+        update_requests = [
+            {
+                "appendCells": {
+                    "sheetId": worksheet.id,
+                    "rows": row_data,
+                    "fields": "userEnteredValue"
+                }
+            }
+        ]
+        if border_sheet:
+            update_requests.append(_border_data_rows_request(worksheet.id))
         try:
-            worksheet.append_row(row)
-            logger.info(f"Successfully appended row to worksheet")
+            worksheet.spreadsheet.batch_update({"requests": update_requests})
+            logger.info("Successfully appended %s row(s) to worksheet", len(rows))
         except Exception as e:
             error_str = str(e).lower()
             if "timeout" in error_str or "timed out" in error_str:
@@ -346,134 +665,243 @@ class ExpenseTracker:
                 year = year or now.year
                 month = month or now.month
             
-            ws = self.setup_monthly_worksheet(user_id, year, month)
+            # Read path: a month without a worksheet simply has no expenses
+            ws = self.get_month_worksheet(user_id, year, month)
             if not ws:
-                return "Could not access your Google Sheet. Please login again."
-            
-            records = ws.get_all_records()
-            
-            if not records:
+                if not self.get_user_spreadsheet(user_id):
+                    return "Could not access your Google Sheet. Please login again."
                 ws_name = get_month_worksheet_name(year, month)
                 return f"No expenses recorded for {ws_name}"
             
-            total = sum(int(record.get('Jumlah', 0)) for record in records)
-            count = len(records)
+            summary_key = (user_id, year, month)
+            write_count = self._write_counts.get(summary_key, 0)
+            cached = self._summary_cache.get(summary_key)
+            if cached and cached[0] == write_count and time.time() - cached[1] < Config.SUMMARY_CACHE_TTL:
+                total, count, categories = cached[2:]
+            else:
+                # Only Jumlah..Kategori, unformatted so amounts come back as numbers
+                rows = ws.get('C2:E', value_render_option='UNFORMATTED_VALUE')
+                total, count, categories = self._aggregate_summary_rows(rows)
+                self._summary_cache[summary_key] = (write_count, time.time(), total, count, categories)
             
-            categories = {}
-            for record in records:
-                cat = record.get('Kategori', 'Other')
-                amount = int(record.get('Jumlah', 0))
-                categories[cat] = categories.get(cat, 0) + amount
+            if not count:
+                ws_name = get_month_worksheet_name(year, month)
+                return f"No expenses recorded for {ws_name}"
             
             ws_name = get_month_worksheet_name(year, month)
-            response = f"📊 *Ringkasan Pengeluaran {ws_name}*\n\n"
-            response += f"💰 Total pengeluaran: Rp {total:,}\n"
-            response += f"💳 Saldo saat ini: Rp {self.get_user_balance(user_id):,}\n"
-            response += f"📝 Jumlah transaksi: {count}\n"
+            parts = [
+                f"📊 *Ringkasan Pengeluaran {ws_name}*\n\n",
+                f"💰 Total pengeluaran: Rp {total:,}\n",
+                f"💳 Saldo saat ini: Rp {self.get_user_balance(user_id):,}\n",
+                f"📝 Jumlah transaksi: {count}\n",
+            ]
             
             if count > 0:
                 # Calculate average per day in the month
                 days_in_month = calendar.monthrange(year, month)[1]
                 avg_per_day = total / days_in_month
-                response += f"📈 Pengeluaran rata-rata per hari: Rp {avg_per_day:,.0f}\n\n"
+                parts.append(f"📈 Pengeluaran rata-rata per hari: Rp {avg_per_day:,.0f}\n\n")
             
-            response += "*Berdasarkan Kategori:*\n"
-            for cat, amount in sorted(categories.items(), key=lambda x: x[1], reverse=True):
-                percentage = (amount / total) * 100 if total > 0 else 0
-                response += f"• {cat}: Rp {amount:,} ({percentage:.1f}%)\n"
+            parts.append("*Berdasarkan Kategori:*\n")
+            parts.extend(self._category_breakdown_lines(categories, total))
             
-            return response
+            return ''.join(parts)
             
         except Exception as e:
             logger.error(f"Error getting monthly summary: {e}")
             return f"Error getting summary: {str(e)}"
 
+    def _category_breakdown_lines(self, categories, total):
+        """Summary lines for each category, largest first"""
+        return [
+            f"• {cat}: Rp {amount:,} ({(amount / total) * 100 if total > 0 else 0:.1f}%)\n"
+            for cat, amount in categories.most_common()
+        ]
+
+    def _aggregate_summary_rows(self, rows):
+        """Total, transaction count and per-category amounts of Jumlah..Kategori rows"""
+        count = 0
+        categories = Counter()
+        for row in rows:
+            if not any(value != '' for value in row):
+                continue
+            cat = row[2] if len(row) > 2 and row[2] else 'Other'
+            categories[cat] += int(row[0] or 0)
+            count += 1
+        return sum(categories.values()), count, categories
+
+    def get_yearly_summary(self, user_id, year=None):
+        """Get per-month summary of a whole year for user"""
+        try:
+            if year is None:
+                year = datetime.now().year
+            spreadsheet = self.get_user_spreadsheet(user_id)
+            if not spreadsheet:
+                return "Could not access your Google Sheet. Please login again."
+            
+            # Months without a worksheet would fail the whole batch, so only ask for existing ones
+            titles = {ws.title for ws in self._cache_month_worksheets(user_id, spreadsheet)}
+            months = [month for month in range(1, 13) if get_month_worksheet_name(year, month) in titles]
+            if not months:
+                return f"No expenses recorded for {year}"
+            
+            # Every month's Jumlah..Kategori in one values.batchGet round-trip
+            result = spreadsheet.values_batch_get(
+                [absolute_range_name(get_month_worksheet_name(year, month), 'C2:E') for month in months],
+                params={'valueRenderOption': 'UNFORMATTED_VALUE'}
+            )
+            
+            year_total = 0
+            year_count = 0
+            year_categories = Counter()
+            month_lines = []
+            for month, value_range in zip(months, result.get('valueRanges', [])):
+                total, count, categories = self._aggregate_summary_rows(value_range.get('values', []))
+                if not count:
+                    continue
+                year_total += total
+                year_count += count
+                year_categories.update(categories)
+                month_lines.append(f"• {get_month_worksheet_name(year, month)}: Rp {total:,} ({count} transaksi)\n")
+            
+            if not year_count:
+                return f"No expenses recorded for {year}"
+            
+            parts = [
+                f"📊 *Ringkasan Pengeluaran {year}*\n\n",
+                f"💰 Total pengeluaran: Rp {year_total:,}\n",
+                f"📝 Jumlah transaksi: {year_count}\n",
+                f"📈 Pengeluaran rata-rata per bulan: Rp {year_total / len(month_lines):,.0f}\n\n",
+                "*Per Bulan:*\n",
+            ]
+            parts.extend(month_lines)
+            
+            parts.append("\n*Berdasarkan Kategori:*\n")
+            parts.extend(self._category_breakdown_lines(year_categories, year_total))
+            
+            return ''.join(parts)
+            
+        except Exception as e:
+            logger.error(f"Error getting yearly summary: {e}")
+            return f"Error getting summary: {str(e)}"
+
+    def remove_user(self, user_id):
+        """Forget user's credentials, spreadsheet and balance"""
+        self.user_credentials.pop(user_id, None)
+        self.user_spreadsheets.pop(user_id, None)
+        self.user_balances.pop(user_id, None)
+        self._budgetin_folder_ids.pop(user_id, None)
+        self._authed_users.discard(user_id)
+        self.invalidate_user_cache(user_id)
+        self._mark_dirty(user_id)
+
+    def _update_auth_state(self, user_id):
+        """Recompute whether user has both credentials and a spreadsheet"""
+        if user_id in self.user_credentials and user_id in self.user_spreadsheets:
+            self._authed_users.add(user_id)
+        else:
+            self._authed_users.discard(user_id)
+
     def is_user_authenticated(self, user_id):
         """Check if user is authenticated"""
-        return str(user_id) in self.user_credentials and str(user_id) in self.user_spreadsheets
+        return user_id in self._authed_users
 
     def set_user_balance(self, user_id, balance):
         """Set initial balance for user"""
-        self.user_balances[str(user_id)] = balance
-        self.save_user_credentials()
+        self.user_balances[user_id] = balance
+        self._mark_dirty(user_id)
 
     def get_user_balance(self, user_id):
         """Get current balance for user"""
-        return self.user_balances.get(str(user_id), 0)
+        return self.user_balances.get(user_id, 0)
 
     def add_balance(self, user_id, amount):
         """Add amount to user balance"""
         current_balance = self.get_user_balance(user_id)
         new_balance = current_balance + amount
-        self.user_balances[str(user_id)] = new_balance
-        self.save_user_credentials()
+        self.user_balances[user_id] = new_balance
+        self._mark_dirty(user_id)
         return new_balance  
 
     def subtract_balance(self, user_id, amount):
         """Subtract amount from user balance"""
         current_balance = self.get_user_balance(user_id)
         new_balance = current_balance - amount
-        self.user_balances[str(user_id)] = new_balance
-        self.save_user_credentials()
+        self.user_balances[user_id] = new_balance
+        self._mark_dirty(user_id)
         return new_balance
 
     def has_balance_set(self, user_id):
         """Check if user has set their balance"""
-        return str(user_id) in self.user_balances
+        return user_id in self.user_balances
     
     # === NEW SMART FEATURES ===
     
-    def get_user_expenses_data(self, user_id: str, days_back: int = 30) -> List[Dict]:
+    def get_user_expenses_data(self, user_id: int, days_back: int = 30) -> List[Dict]:
         """Get user expenses data for analytics (from current month worksheet)"""
         try:
             now = get_jakarta_now()
-            ws = self.setup_monthly_worksheet(user_id, now.year, now.month)
+            ws = self.get_month_worksheet(user_id, now.year, now.month)
             if not ws:
                 return []
             
-            records = ws.get_all_records()
-            expenses = []
-            
-            for record in records:
-                try:
-                    # Convert record to our format
-                    expense_data = {
-                        'amount': int(record.get('Jumlah', 0)),
-                        'description': record.get('Keterangan', ''),
-                        'category': record.get('Kategori', 'Other'),
-                        'date': record.get('Tanggal', ''),
-                        'time': record.get('Waktu', ''),
-                        'datetime': self._parse_expense_datetime(record.get('Tanggal', ''), record.get('Waktu', ''))
-                    }
-                    
-                    # Filter by days_back if specified
-                    if days_back > 0:
-                        cutoff_date = now - timedelta(days=days_back)
-                        if expense_data['datetime'] >= cutoff_date:
-                            expenses.append(expense_data)
-                    else:
-                        expenses.append(expense_data)
-                        
-                except Exception as e:
-                    logger.warning(f"Error parsing expense record: {e}")
-                    continue
+            # The month's parsed rows are shared by every analytics call until a new row lands
+            month_key = (user_id, now.year, now.month)
+            write_count = self._write_counts.get(month_key, 0)
+            cached = self._expenses_cache.get(month_key)
+            if cached and cached[0] == write_count and time.time() - cached[1] < Config.SUMMARY_CACHE_TTL:
+                month_expenses = cached[2]
+            else:
+                month_expenses = self._read_month_expenses(ws)
+                self._expenses_cache[month_key] = (write_count, time.time(), month_expenses)
             
-            return expenses
+            if days_back > 0:
+                cutoff_date = now - timedelta(days=days_back)
+                return [expense for expense in month_expenses if expense['datetime'] >= cutoff_date]
+            return list(month_expenses)
             
         except Exception as e:
             logger.error(f"Error getting user expenses data: {e}")
             return []
     
+    def _read_month_expenses(self, ws) -> List[Dict]:
+        """Read and parse every expense row of a monthly worksheet, oldest first"""
+        records = ws.get_all_records()
+        expenses = []
+        for record in records:
+            try:
+                # Convert record to our format
+                expenses.append({
+                    'amount': int(record.get('Jumlah', 0)),
+                    'description': record.get('Keterangan', ''),
+                    'category': record.get('Kategori', 'Other'),
+                    'date': record.get('Tanggal', ''),
+                    'time': record.get('Waktu', ''),
+                    'datetime': ensure_jakarta_aware(
+                        self._parse_expense_datetime(record.get('Tanggal', ''), record.get('Waktu', ''))
+                    )
+                })
+            except Exception as e:
+                logger.warning(f"Error parsing expense record: {e}")
+                continue
+        
+        # Detectors rely on chronological order (already the sheet order, so this is cheap)
+        expenses.sort(key=lambda expense: expense['datetime'])
+        return expenses
+    
     def _parse_expense_datetime(self, date_str: str, time_str: str) -> datetime:
-        """Parse datetime from Indonesian date format"""
-        try:
-            # This is a simplified parser - you may need to enhance based on your date format
-            # For now, return current time as fallback
-            return get_jakarta_now()
-        except:
+        """Parse datetime from the sheet's Indonesian date and HH:MM:SS time columns"""
+        # A month's rows share a few dozen dates, so the date part is served from parse_tanggal_indo's cache
+        date = parse_tanggal_indo(str(date_str))
+        if date is None:
             return get_jakarta_now()
+        try:
+            hour, minute, second = (int(part) for part in (str(time_str).split(':') + ['0', '0'])[:3])
+            return date.replace(hour=hour, minute=minute, second=second)
+        except ValueError:
+            return date
     
-    def add_expense_with_smart_features(self, user_id: str, amount: int, description: str, category: str) -> Tuple[bool, str, Dict]:
+    def add_expense_with_smart_features(self, user_id: int, amount: int, description: str, category: str) -> Tuple[bool, str, Dict]:
         """Enhanced add_expense with smart features - optimized to avoid timeout"""
         
         # First, add expense normally (this is the critical operation)
@@ -493,7 +921,7 @@ class ExpenseTracker:
         # Smart features will be processed asynchronously if needed
         return success, message, smart_insights
     
-    def add_expense_with_smart_features_full(self, user_id: str, amount: int, description: str, category: str) -> Tuple[bool, str, Dict]:
+    def add_expense_with_smart_features_full(self, user_id: int, amount: int, description: str, category: str) -> Tuple[bool, str, Dict]:
         """Full version with smart features (for manual calls when timeout is not a concern)"""
         
         # First, add expense normally
@@ -549,7 +977,7 @@ class ExpenseTracker:
         
         return success, message, smart_insights
     
-    def get_smart_insights_for_expense(self, user_id: str, amount: int, description: str, category: str) -> Dict:
+    def get_smart_insights_for_expense(self, user_id: int, amount: int, description: str, category: str) -> Dict:
         """Get smart insights for an expense without adding it to the sheet"""
         smart_insights = {
             'budget_alert': None,
@@ -598,7 +1026,7 @@ class ExpenseTracker:
         
         return smart_insights
     
-    def get_quick_smart_insights(self, user_id: str, amount: int, description: str, category: str) -> Dict:
+    def get_quick_smart_insights(self, user_id: int, amount: int, description: str, category: str) -> Dict:
         """Get basic smart insights without complex processing to avoid timeout"""
         smart_insights = {
             'budget_alert': None,
@@ -623,18 +1051,17 @@ class ExpenseTracker:
         
         return smart_insights
     
-    def _is_potential_duplicate(self, user_id: str, amount: int, description: str) -> bool:
+    def _is_potential_duplicate(self, user_id: int, amount: int, description: str) -> bool:
         """Check if this expense might be a duplicate of a recent one"""
         from datetime import timedelta
         from utils.date_utils import safe_datetime_subtract
         
-        user_id_str = str(user_id)
         current_time = get_jakarta_now()
         
         # Clean up old entries (older than 5 minutes)
-        if user_id_str in self.recent_expenses:
+        if user_id in self.recent_expenses:
             filtered_expenses = []
-            for amt, desc, timestamp in self.recent_expenses[user_id_str]:
+            for amt, desc, timestamp in self.recent_expenses[user_id]:
                 try:
                     time_diff = safe_datetime_subtract(current_time, timestamp)
                     if time_diff < timedelta(minutes=5):
@@ -644,11 +1071,14 @@ class ExpenseTracker:
                     # Skip this entry if there's a timestamp issue
                     continue
             
-            self.recent_expenses[user_id_str] = filtered_expenses
+            if filtered_expenses:
+                self.recent_expenses[user_id] = filtered_expenses
+            else:
+                del self.recent_expenses[user_id]
         
         # Check for duplicates in the last 2 minutes
-        if user_id_str in self.recent_expenses:
-            for recent_amount, recent_desc, timestamp in self.recent_expenses[user_id_str]:
+        if user_id in self.recent_expenses:
+            for recent_amount, recent_desc, timestamp in self.recent_expenses[user_id]:
                 try:
                     time_diff = safe_datetime_subtract(current_time, timestamp)
                     if (time_diff < timedelta(minutes=2) and 
@@ -661,33 +1091,37 @@ class ExpenseTracker:
         
         return False
     
-    def _record_expense_for_duplicate_check(self, user_id: str, amount: int, description: str, timestamp):
+    def _record_expense_for_duplicate_check(self, user_id: int, amount: int, description: str, timestamp):
         """Record this expense for future duplicate checking"""
-        user_id_str = str(user_id)
-        
-        if user_id_str not in self.recent_expenses:
-            self.recent_expenses[user_id_str] = []
+        if user_id not in self.recent_expenses:
+            self.recent_expenses[user_id] = []
         
-        self.recent_expenses[user_id_str].append((amount, description, timestamp))
+        self.recent_expenses[user_id].append((amount, description, timestamp))
         
         # Keep only last 10 expenses per user to avoid memory issues
-        if len(self.recent_expenses[user_id_str]) > 10:
-            self.recent_expenses[user_id_str] = self.recent_expenses[user_id_str][-10:]
+        if len(self.recent_expenses[user_id]) > 10:
+            self.recent_expenses[user_id] = self.recent_expenses[user_id][-10:]
     
-    def get_budget_status_for_category(self, user_id: str, category: str) -> Dict:
+    def _aggregate_by_category(self, expenses: List[Dict]) -> Counter:
+        """Total amount per category in a single pass"""
+        totals = Counter()
+        for expense in expenses:
+            totals[expense['category']] += expense['amount']
+        return totals
+    
+    def get_budget_status_for_category(self, user_id: int, category: str) -> Dict:
         """Get budget status for specific category"""
         try:
             # Get current month expenses for this category
             user_expenses = self.get_user_expenses_data(user_id, days_back=30)
-            category_expenses = [e for e in user_expenses if e['category'] == category]
-            total_spent = sum(e['amount'] for e in category_expenses)
+            total_spent = self._aggregate_by_category(user_expenses)[category]
             
             return self.budget_planner.get_budget_status(user_id, category, total_spent)
         except Exception as e:
             logger.error(f"Error getting budget status: {e}")
             return {'status': 'error', 'message': f'Error: {str(e)}'}
     
-    def get_monthly_insights_report(self, user_id: str) -> str:
+    def get_monthly_insights_report(self, user_id: int) -> str:
         """Generate comprehensive monthly insights report"""
         try:
             user_expenses = self.get_user_expenses_data(user_id, days_back=30)
@@ -696,7 +1130,7 @@ class ExpenseTracker:
             logger.error(f"Error generating insights report: {e}")
             return f"❌ Error generating report: {str(e)}"
     
-    def get_spending_trends(self, user_id: str, months_back: int = 6) -> Dict:
+    def get_spending_trends(self, user_id: int, months_back: int = 6) -> Dict:
         """Get spending trends analysis"""
         try:
             # For now, get current month data - can be enhanced to get multiple months
@@ -706,7 +1140,7 @@ class ExpenseTracker:
             logger.error(f"Error getting spending trends: {e}")
             return {'error': f'Error: {str(e)}'}
     
-    def get_category_insights(self, user_id: str, period_days: int = 30) -> Dict:
+    def get_category_insights(self, user_id: int, period_days: int = 30) -> Dict:
         """Get detailed category insights"""
         try:
             user_expenses = self.get_user_expenses_data(user_id, days_back=period_days)
@@ -715,7 +1149,7 @@ class ExpenseTracker:
             logger.error(f"Error getting category insights: {e}")
             return {'error': f'Error: {str(e)}'}
     
-    def get_daily_summary_with_alerts(self, user_id: str) -> Dict:
+    def get_daily_summary_with_alerts(self, user_id: int) -> Dict:
         """Get daily summary with smart alerts"""
         try:
             # Get today's expenses
@@ -732,17 +1166,14 @@ class ExpenseTracker:
             logger.error(f"Error getting daily summary: {e}")
             return {'error': f'Error: {str(e)}'}
     
-    def get_weekly_budget_review(self, user_id: str) -> Dict:
+    def get_weekly_budget_review(self, user_id: int) -> Dict:
         """Get weekly budget review"""
         try:
             # Get last 7 days expenses
             user_expenses = self.get_user_expenses_data(user_id, days_back=7)
             
             # Group by category
-            weekly_expenses = {}
-            for expense in user_expenses:
-                category = expense['category']
-                weekly_expenses[category] = weekly_expenses.get(category, 0) + expense['amount']
+            weekly_expenses = self._aggregate_by_category(user_expenses)
             
             return self.alert_system.get_weekly_budget_review(user_id, weekly_expenses)
         except Exception as e:
@@ -755,20 +1186,16 @@ class ExpenseTracker:
             # Get this month's expenses
             user_expenses = self.get_user_expenses_data(user_id, days_back=31)
             
-            # Filter by category and current month
+            # Filter by category and current month; 'date' holds the Indonesian display
+            # string, so the month check uses the parsed datetime
             now = get_jakarta_now()
-            current_month = now.month
-            current_year = now.year
-            
-            total_spent = 0
-            for expense in user_expenses:
-                expense_date = datetime.strptime(expense['date'], '%Y-%m-%d')
-                if (expense_date.month == current_month and 
-                    expense_date.year == current_year and 
-                    expense['category'].lower() == category.lower()):
-                    total_spent += expense['amount']
-            
-            return total_spent
+            category = category.lower()
+            return sum(
+                expense['amount'] for expense in user_expenses
+                if expense['datetime'].month == now.month
+                and expense['datetime'].year == now.year
+                and expense['category'].lower() == category
+            )
         except Exception as e:
             logger.error(f"Error getting category spending: {e}")
             return 0.0
@@ -1,4 +1,5 @@
 import logging
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 from models.budget_planner import BudgetPlanner
@@ -13,7 +14,7 @@ class SmartAlertSystem:
         self.budget_planner = budget_planner
         self.alert_history = {}  # Track when alerts were sent to avoid spam
     
-    def check_budget_alerts(self, user_id: str, category: str, spent_amount: int) -> Optional[Dict]:
+    def check_budget_alerts(self, user_id: int, category: str, spent_amount: int) -> Optional[Dict]:
         """Check if budget alert should be triggered"""
         budget_status = self.budget_planner.get_budget_status(user_id, category, spent_amount)
         
@@ -41,17 +42,15 @@ class SmartAlertSystem:
         
         return None
     
-    def generate_daily_reminder(self, user_id: str, daily_expenses: List[Dict]) -> Optional[Dict]:
+    def generate_daily_reminder(self, user_id: int, daily_expenses: List[Dict]) -> Optional[Dict]:
         """Generate daily spending reminder"""
         if not daily_expenses:
             return None
         
-        today_total = sum(expense['amount'] for expense in daily_expenses)
-        categories_spent = {}
-        
+        categories_spent = Counter()
         for expense in daily_expenses:
-            category = expense['category']
-            categories_spent[category] = categories_spent.get(category, 0) + expense['amount']
+            categories_spent[expense['category']] += expense['amount']
+        today_total = sum(categories_spent.values())
         
         # Check budget alerts for each category
         alerts = []
@@ -66,7 +65,7 @@ class SmartAlertSystem:
         
         if categories_spent:
             message += "*Per Kategori:*\n"
-            for category, amount in sorted(categories_spent.items(), key=lambda x: x[1], reverse=True):
+            for category, amount in categories_spent.most_common():
                 message += f"• {category}: Rp {amount:,}\n"
         
         if alerts:
@@ -81,7 +80,7 @@ class SmartAlertSystem:
             'total_spent': today_total
         }
     
-    def check_spending_velocity_alert(self, user_id: str, recent_expenses: List[Dict], time_window_hours: int = 2) -> Optional[Dict]:
+    def check_spending_velocity_alert(self, user_id: int, recent_expenses: List[Dict], time_window_hours: int = 2) -> Optional[Dict]:
         """Alert for rapid spending (multiple transactions in short time)"""
         if len(recent_expenses) < 3:  # Need at least 3 transactions
             return None
@@ -125,7 +124,7 @@ class SmartAlertSystem:
         
         return None
     
-    def check_weekend_spending_alert(self, user_id: str, expense_amount: int, category: str) -> Optional[Dict]:
+    def check_weekend_spending_alert(self, user_id: int, expense_amount: int, category: str) -> Optional[Dict]:
         """Alert for weekend entertainment/shopping expenses"""
         now = get_jakarta_now()
         is_weekend = now.weekday() >= 5  # Saturday=5, Sunday=6
@@ -153,7 +152,7 @@ class SmartAlertSystem:
         
         return None
     
-    def get_weekly_budget_review(self, user_id: str, weekly_expenses: Dict[str, int]) -> Dict:
+    def get_weekly_budget_review(self, user_id: int, weekly_expenses: Dict[str, int]) -> Dict:
         """Generate weekly budget review"""
         user_budgets = self.budget_planner.get_user_budgets(user_id)
         
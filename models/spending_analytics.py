@@ -331,7 +331,7 @@ class SpendingAnalytics:
         else:
             return 'needs_attention'
     
-    def generate_monthly_insights_report(self, user_expenses: List[Dict], user_id: str) -> str:
+    def generate_monthly_insights_report(self, user_expenses: List[Dict], user_id: int) -> str:
         """Generate comprehensive monthly insights report"""
         now = get_jakarta_now()
         month_name = now.strftime('%B %Y')
@@ -342,23 +342,23 @@ class SpendingAnalytics:
         velocity = self.get_spending_velocity_analysis(user_expenses)
         comparison = self.get_comparative_analysis(user_expenses)
         
-        report = f"📊 *Laporan Analisis Pengeluaran {month_name}*\n\n"
+        parts = [f"📊 *Laporan Analisis Pengeluaran {month_name}*\n\n"]
         
         # Overall summary
         if 'error' not in category_insights:
-            report += f"💰 Total Pengeluaran: Rp {category_insights['total_spending']:,}\n"
-            report += f"📝 Jumlah Transaksi: {category_insights['total_transactions']}\n"
-            report += f"💳 Rata-rata per Hari: Rp {category_insights['daily_average']:,.0f}\n\n"
+            parts.append(f"💰 Total Pengeluaran: Rp {category_insights['total_spending']:,}\n")
+            parts.append(f"📝 Jumlah Transaksi: {category_insights['total_transactions']}\n")
+            parts.append(f"💳 Rata-rata per Hari: Rp {category_insights['daily_average']:,.0f}\n\n")
             
             # Top spending categories
-            report += "*🏆 Kategori Pengeluaran Terbesar:*\n"
+            parts.append("*🏆 Kategori Pengeluaran Terbesar:*\n")
             for i, (category, data) in enumerate(category_insights['rankings']['by_amount'][:3]):
                 emoji = ["🥇", "🥈", "🥉"][i]
-                report += f"{emoji} {category}: Rp {data['total_amount']:,} ({data['percentage_of_total']:.1f}%)\n"
-            report += "\n"
+                parts.append(f"{emoji} {category}: Rp {data['total_amount']:,} ({data['percentage_of_total']:.1f}%)\n")
+            parts.append("\n")
             
             # Spending patterns
-            report += "*📈 Pola Pengeluaran:*\n"
+            parts.append("*📈 Pola Pengeluaran:*\n")
             for category, data in list(category_insights['categories'].items())[:5]:
                 pattern = data['spending_pattern']
                 pattern_emoji = {
@@ -371,14 +371,14 @@ class SpendingAnalytics:
                     'infrequent': '🔹'
                 }.get(pattern, '📋')
                 
-                report += f"{pattern_emoji} {category}: {pattern.replace('_', ' ').title()}\n"
-            report += "\n"
+                parts.append(f"{pattern_emoji} {category}: {pattern.replace('_', ' ').title()}\n")
+            parts.append("\n")
         
         # Trend analysis
         if 'error' not in trends:
             trend_emoji = {'increasing': '📈', 'decreasing': '📉', 'stable': '➡️'}
-            report += f"*📊 Tren Pengeluaran: {trend_emoji.get(trends['trend'], '📊')} {trends['trend'].title()}*\n"
-            report += f"Rata-rata bulanan: Rp {trends['average_monthly_spending']:,.0f}\n\n"
+            parts.append(f"*📊 Tren Pengeluaran: {trend_emoji.get(trends['trend'], '📊')} {trends['trend'].title()}*\n")
+            parts.append(f"Rata-rata bulanan: Rp {trends['average_monthly_spending']:,.0f}\n\n")
         
         # Velocity insights
         if 'error' not in velocity:
@@ -388,18 +388,18 @@ class SpendingAnalytics:
                 'regular': '🧘‍♂️',
                 'infrequent': '🐌'
             }
-            report += f"*⚡ Kecepatan Pengeluaran: {velocity_emoji.get(velocity['velocity_pattern'], '📊')}*\n"
-            report += f"Rata-rata jarak antar transaksi: {velocity['average_time_between_transactions_hours']:.1f} jam\n"
+            parts.append(f"*⚡ Kecepatan Pengeluaran: {velocity_emoji.get(velocity['velocity_pattern'], '📊')}*\n")
+            parts.append(f"Rata-rata jarak antar transaksi: {velocity['average_time_between_transactions_hours']:.1f} jam\n")
             
             if velocity['spending_bursts']:
-                report += f"⚠️ Terdeteksi {len(velocity['spending_bursts'])} periode pengeluaran intensif\n"
-            report += "\n"
+                parts.append(f"⚠️ Terdeteksi {len(velocity['spending_bursts'])} periode pengeluaran intensif\n")
+            parts.append("\n")
         
         # Comparative analysis and recommendations
         if 'error' not in comparison and comparison['recommendations']:
-            report += "*💡 Rekomendasi:*\n"
+            parts.append("*💡 Rekomendasi:*\n")
             for rec in comparison['recommendations'][:3]:
-                report += f"• {rec}\n"
+                parts.append(f"• {rec}\n")
             
             health_emoji = {
                 'excellent': '💚',
@@ -408,8 +408,8 @@ class SpendingAnalytics:
                 'needs_attention': '❤️'
             }
             health = comparison['overall_assessment']
-            report += f"\n{health_emoji.get(health, '📊')} *Status Keuangan: {health.replace('_', ' ').title()}*\n"
+            parts.append(f"\n{health_emoji.get(health, '📊')} *Status Keuangan: {health.replace('_', ' ').title()}*\n")
         
-        report += f"\n🔄 *Laporan ini diperbarui otomatis setiap bulan*"
+        parts.append(f"\n🔄 *Laporan ini diperbarui otomatis setiap bulan*")
         
-        return report
+        return ''.join(parts)
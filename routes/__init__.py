@@ -3,16 +3,30 @@ Flask routes for the Budgetin bot application.
 Handles health check, OAuth callback, and OAuth info endpoints.
 """
 
+import hashlib
 import logging
-from flask import request, Flask
-from utils.date_utils import get_jakarta_now
+from flask import request, Flask, Response
+from utils.date_utils import get_jakarta_now, get_jakarta_timestamp
+from utils.json_utils import json_dumps
 
 logger = logging.getLogger(__name__)
 
 
-def register_routes(app: Flask):
+def register_routes(app: Flask, config_validation=(True, ())):
     """Register all Flask routes with the app"""
     
+    # Validation result from startup; config does not change at runtime
+    config_valid, config_errors = config_validation
+    health_services = {
+        'flask': 'running',
+        'telegram_bot': 'running',
+        'google_api': 'connected',
+        'config': 'valid' if config_valid else 'invalid'
+    }
+    # Probes that already hold this ETag get a 304; the timestamp is
+    # deliberately excluded so the tag stays stable while healthy
+    health_etag = hashlib.sha1(json_dumps(health_services)).hexdigest()
+    
     @app.route('/', methods=['GET'])
     def health_check():
         """Enhanced health check endpoint with OAuth code display"""
@@ -151,18 +165,21 @@ def register_routes(app: Flask):
                 return html_response
             
             # Regular health check without OAuth code
+            if request.if_none_match.contains(health_etag):
+                response = Response(status=304)
+                response.set_etag(health_etag)
+                return response
+            
             health_status = {
                 'status': 'healthy',
-                'timestamp': get_jakarta_now().isoformat(),
+                'timestamp': get_jakarta_timestamp(),
                 'message': 'Budgetin Bot is running smoothly',
                 'version': '2.0.0',
-                'services': {
-                    'flask': 'running',
-                    'telegram_bot': 'running',
-                    'google_api': 'connected'
-                }
+                'services': health_services
             }
-            return health_status, 200
+            response = Response(json_dumps(health_status), status=200, mimetype='application/json')
+            response.set_etag(health_etag)
+            return response
         except Exception as e:
             logger.error(f"Health check error: {e}")
             return {'status': 'error', 'message': str(e)}, 500
@@ -0,0 +1,100 @@
+import random
+import statistics
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+import models.anomaly_detector as anomaly_module
+from models.anomaly_detector import AnomalyDetector, median, sample_stdev
+from utils.date_utils import JAKARTA_TZ
+
+NOW = JAKARTA_TZ.localize(datetime(2025, 3, 15, 12, 0, 0))
+CATEGORIES = ['Daily Needs', 'Transportation', 'Entertainment', 'Health']
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    monkeypatch.setattr(anomaly_module, 'get_jakarta_now', lambda: NOW)
+    return AnomalyDetector()
+
+
+def random_history(rng, span, count):
+    """Chronological Jakarta-aware expenses, some exactly on whole-hour/day boundaries"""
+    offsets = [rng.choice([rng.random() * span, float(rng.randint(0, int(span)))]) for _ in range(count)]
+    return [
+        {
+            'amount': rng.randint(1, 500) * 1000,
+            'category': rng.choice(CATEGORIES),
+            'datetime': NOW - timedelta(hours=offset),
+        }
+        for offset in sorted(offsets, reverse=True)
+    ]
+
+
+def reference_window(expenses, window_start):
+    """Per-row comparison the bisect-based window replaced"""
+    return [expense for expense in expenses if expense['datetime'] >= window_start]
+
+
+def test_frequency_window_matches_linear_scan(detector):
+    rng = random.Random(7)
+    for _ in range(500):
+        expenses = random_history(rng, span=72, count=rng.randint(5, 40))
+        recent = reference_window(expenses, NOW - timedelta(hours=24))
+
+        result = detector.detect_frequency_anomaly(1, expenses)
+
+        if len(recent) >= 8:
+            assert result['transaction_count'] == len(recent)
+            assert result['total_amount'] == sum(expense['amount'] for expense in recent)
+        else:
+            assert result is None
+
+
+def reference_shift_changes(expenses, recent_days):
+    cutoff = NOW - timedelta(days=recent_days)
+    recent = reference_window(expenses, cutoff)
+    historical = [expense for expense in expenses if expense['datetime'] < cutoff]
+    if len(recent) < 3 or len(historical) < 10:
+        return []
+
+    def distribution(rows):
+        totals = Counter()
+        for row in rows:
+            totals[row['category']] += row['amount']
+        total = sum(totals.values())
+        return {category: amount / total * 100 for category, amount in totals.items()}
+
+    recent_dist, historical_dist = distribution(recent), distribution(historical)
+    return [
+        category for category, pct in recent_dist.items()
+        if pct > 40 and historical_dist.get(category, 0) < 20
+    ]
+
+
+def test_category_shift_split_matches_linear_scan(detector):
+    rng = random.Random(11)
+    for _ in range(500):
+        expenses = random_history(rng, span=24 * 30, count=rng.randint(20, 60))
+
+        result = detector.detect_category_shift_anomaly(expenses, recent_days=7)
+
+        changed = [change['category'] for change in result['changes']] if result else []
+        assert changed == reference_shift_changes(expenses, 7)
+
+
+def test_median_matches_statistics_median():
+    rng = random.Random(3)
+    for _ in range(2000):
+        values = [rng.randint(0, 5000000) for _ in range(rng.randint(1, 50))]
+        assert median(values) == statistics.median(values)
+
+
+def test_sample_stdev_matches_statistics_stdev():
+    rng = random.Random(5)
+    for _ in range(2000):
+        values = [rng.randint(0, 5000000) for _ in range(rng.randint(2, 50))]
+        mean = sum(values) / len(values)
+        assert sample_stdev(values, mean) == pytest.approx(statistics.stdev(values))
+    assert sample_stdev([1000], 1000) == 0
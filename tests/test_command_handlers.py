@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from handlers.command_handlers import summary_command
+
+USER_ID = 42
+
+
+def make_update():
+    loading_msg = SimpleNamespace(edit_text=AsyncMock())
+    message = SimpleNamespace(reply_text=AsyncMock(return_value=loading_msg))
+    return SimpleNamespace(effective_user=SimpleNamespace(id=USER_ID), message=message), loading_msg
+
+
+def make_tracker():
+    tracker = MagicMock()
+    tracker.is_user_authenticated.return_value = True
+    tracker.get_monthly_summary.return_value = "monthly"
+    tracker.get_yearly_summary.return_value = "yearly"
+    tracker.user_spreadsheets = {}
+    return tracker
+
+
+@pytest.mark.asyncio
+async def test_ringkasan_without_args_shows_this_month():
+    update, loading_msg = make_update()
+    tracker = make_tracker()
+
+    await summary_command(update, SimpleNamespace(args=[]), tracker)
+
+    tracker.get_monthly_summary.assert_called_once_with(USER_ID)
+    tracker.get_yearly_summary.assert_not_called()
+    assert loading_msg.edit_text.call_args.args[0] == "monthly"
+
+
+@pytest.mark.asyncio
+async def test_ringkasan_tahun_defaults_to_current_year():
+    update, loading_msg = make_update()
+    tracker = make_tracker()
+
+    await summary_command(update, SimpleNamespace(args=["tahun"]), tracker)
+
+    tracker.get_yearly_summary.assert_called_once_with(USER_ID, None)
+    assert loading_msg.edit_text.call_args.args[0] == "yearly"
+
+
+@pytest.mark.asyncio
+async def test_ringkasan_tahun_with_year():
+    update, _ = make_update()
+    tracker = make_tracker()
+
+    await summary_command(update, SimpleNamespace(args=["TAHUN", "2024"]), tracker)
+
+    tracker.get_yearly_summary.assert_called_once_with(USER_ID, 2024)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("year_arg", ["abc", "24", "20245", "-2024", "0000", "1999", "２０２４"])
+async def test_ringkasan_tahun_rejects_invalid_year(year_arg):
+    update, loading_msg = make_update()
+    tracker = make_tracker()
+
+    await summary_command(update, SimpleNamespace(args=["tahun", year_arg]), tracker)
+
+    tracker.get_yearly_summary.assert_not_called()
+    tracker.get_monthly_summary.assert_not_called()
+    update.message.reply_text.assert_called_once()
+    assert "/ringkasan tahun 2024" in update.message.reply_text.call_args.args[0]
+    loading_msg.edit_text.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_ringkasan_requires_login():
+    update, _ = make_update()
+    tracker = make_tracker()
+    tracker.is_user_authenticated.return_value = False
+
+    await summary_command(update, SimpleNamespace(args=["tahun"]), tracker)
+
+    tracker.get_yearly_summary.assert_not_called()
+    assert "/login" in update.message.reply_text.call_args.args[0]
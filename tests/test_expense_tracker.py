@@ -0,0 +1,136 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+import models.expense_tracker as tracker_module
+import utils.error_handlers as error_handlers
+from config import Config
+from models.expense_tracker import ExpenseTracker
+from utils.error_handlers import RateLimiter
+
+USER_ID = 42
+START_BALANCE = 1000000
+CALLERS = 8
+
+
+class FakeSpreadsheet:
+    """Records batchUpdate bodies and answers each call through on_update(call_number, body)"""
+
+    def __init__(self, on_update):
+        self.calls = []
+        self.on_update = on_update
+        self._lock = threading.Lock()
+
+    def batch_update(self, body):
+        with self._lock:
+            self.calls.append(body)
+            call_number = len(self.calls)
+        return self.on_update(call_number, body)
+
+
+class FakeWorksheet:
+    id = 1
+
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+
+def appended_rows(body):
+    rows = body['requests'][0]['appendCells']['rows']
+    return [[next(iter(cell['userEnteredValue'].values())) for cell in row['values']] for row in rows]
+
+
+@pytest.fixture
+def tracker(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'USER_DATA_DIR', str(tmp_path / 'creds'))
+    monkeypatch.setattr(Config, 'USER_CREDENTIALS_FILE', str(tmp_path / 'user_credentials.pkl'))
+    monkeypatch.setattr(tracker_module, 'rate_limiter', RateLimiter(max_requests=100))
+    monkeypatch.setattr(error_handlers.time, 'sleep', lambda seconds: None)
+    expense_tracker = ExpenseTracker(budget_planner=MagicMock())
+    expense_tracker.user_balances[USER_ID] = START_BALANCE
+    return expense_tracker
+
+
+def pending_count(expense_tracker):
+    with expense_tracker._pending_lock:
+        return sum(len(batch) for batch in expense_tracker._pending_rows.values())
+
+
+def run_concurrent_adds(expense_tracker, on_later_update):
+    """First caller's write blocks until every other caller has queued its row behind it"""
+    first_write_started = threading.Event()
+
+    def on_update(call_number, body):
+        if call_number == 1:
+            first_write_started.set()
+            deadline = time.monotonic() + 5
+            while pending_count(expense_tracker) < CALLERS - 1:
+                assert time.monotonic() < deadline, "other callers never queued"
+                time.sleep(0.001)
+            return {}
+        return on_later_update(call_number, body)
+
+    spreadsheet = FakeSpreadsheet(on_update)
+    worksheet = FakeWorksheet(spreadsheet)
+    expense_tracker.setup_monthly_worksheet = lambda user_id, year, month: worksheet
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as executor:
+        first = executor.submit(expense_tracker.add_expense, USER_ID, 1000, "item 0", "Other")
+        assert first_write_started.wait(5)
+        rest = [
+            executor.submit(expense_tracker.add_expense, USER_ID, 1000 * (i + 1), f"item {i}", "Other")
+            for i in range(1, CALLERS)
+        ]
+        results = [first.result(5)] + [future.result(5) for future in rest]
+    return spreadsheet, results
+
+
+def test_concurrent_adds_share_one_batch(tracker):
+    spreadsheet, results = run_concurrent_adds(tracker, lambda call_number, body: {})
+
+    assert results == [(True, "Successfully saved")] * CALLERS
+    assert len(spreadsheet.calls) == 2
+    first_rows, batched_rows = (appended_rows(body) for body in spreadsheet.calls)
+    assert len(first_rows) == 1
+    assert len(batched_rows) == CALLERS - 1
+
+    # Every caller's row landed exactly once, in balance order
+    rows = first_rows + batched_rows
+    assert sorted(row[3] for row in rows) == sorted(f"item {i}" for i in range(CALLERS))
+    balances = [row[6] for row in rows]
+    assert balances == sorted(balances, reverse=True)
+    assert tracker.get_user_balance(USER_ID) == START_BALANCE - sum(row[2] for row in rows)
+    assert pending_count(tracker) == 0
+
+
+def test_batch_failure_reaches_every_waiter(tracker):
+    def fail(call_number, body):
+        raise Exception("Requested entity was not found")
+
+    spreadsheet, results = run_concurrent_adds(tracker, fail)
+
+    assert results[0] == (True, "Successfully saved")
+    assert len(spreadsheet.calls) == 2  # permanent errors are not retried
+    for success, message in results[1:]:
+        assert success is False
+        assert "tidak ditemukan" in message
+    assert pending_count(tracker) == 0
+
+
+def test_transient_error_is_retried_once_per_batch(tracker):
+    def flaky(call_number, body):
+        if call_number == 1:
+            raise Exception("The service is currently unavailable: timed out")
+        return {}
+
+    spreadsheet = FakeSpreadsheet(flaky)
+    worksheet = FakeWorksheet(spreadsheet)
+    tracker.setup_monthly_worksheet = lambda user_id, year, month: worksheet
+
+    assert tracker.add_expense(USER_ID, 5000, "kopi", "Daily Needs") == (True, "Successfully saved")
+    assert len(spreadsheet.calls) == 2
+    assert appended_rows(spreadsheet.calls[0]) == appended_rows(spreadsheet.calls[1])
+    assert tracker.get_user_balance(USER_ID) == START_BALANCE - 5000
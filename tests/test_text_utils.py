@@ -0,0 +1,63 @@
+import random
+import re
+
+import pytest
+
+from utils.text_utils import extract_amount
+
+# extract_amount as it was before chunk10-12: patterns ran on a lowered,
+# comma-to-dot copy of the message. Kept here as the reference behaviour.
+_REF_UNIT = re.compile(r'(\d+(?:[\.,]\d+)?)(?:\s*)(rb|ribu|k|juta)')
+_REF_DOTTED = re.compile(r'(\d{1,3}(?:\.\d{3})+)(?!\.\d)')
+_REF_PLAIN = re.compile(r'(\d{4,})')
+_REF_THOUSANDS_DOT = re.compile(r'\.(?=\d{3})')
+
+
+def reference_extract_amount(text):
+    text_lower = text.lower().replace(',', '.')
+
+    match = _REF_UNIT.search(text_lower)
+    if match:
+        amount_str, satuan = match.groups()
+        amount = float(_REF_THOUSANDS_DOT.sub('', amount_str).replace(',', '.'))
+        if satuan in ['rb', 'ribu', 'k']:
+            amount *= 1000
+        elif satuan == 'juta':
+            amount *= 1000000
+        return int(amount), match.start(), match.end()
+
+    match = _REF_DOTTED.search(text_lower)
+    if match:
+        return int(match.group(1).replace('.', '')), match.start(), match.end()
+
+    match = _REF_PLAIN.search(text_lower)
+    if match:
+        return int(match.group(1)), match.start(), match.end()
+
+    return None, None, None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("beli beras 50rb", (50000, 11, 15)),
+    ("makan siang 25000", (25000, 12, 17)),
+    ("bensin motor 30K", (30000, 13, 16)),
+    ("bayar listrik 200.000", (200000, 14, 21)),
+    ("laptop 15.000.000", (15000000, 7, 17)),
+    ("cicilan 1,5 juta", (1500000, 8, 16)),
+    ("kopi 2 Ribu", (2000, 5, 11)),
+    ("parkir 500", (None, None, None)),
+    ("halo", (None, None, None)),
+])
+def test_extract_amount_examples(text, expected):
+    assert extract_amount(text) == expected
+
+
+def test_extract_amount_matches_reference_on_random_messages():
+    # ASCII only: lower() keeps ASCII lengths, so the reference's positions
+    # index the original text just like the current implementation's do
+    pieces = ['1', '2', '5', '0', '00', '000', '.', ',', ' ', 'rb', 'RB', 'ribu', 'Ribu',
+              'k', 'K', 'juta', 'JUTA', 'beli', 'makan', 'x', '-']
+    rng = random.Random(20240512)
+    for _ in range(50000):
+        text = ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 10)))
+        assert extract_amount(text) == reference_extract_amount(text), text
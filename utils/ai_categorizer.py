@@ -6,9 +6,25 @@ import logging
 import google.generativeai as genai
 from typing import Optional
 from config import Config
+from utils.text_utils import KeywordClassifier
 
 logger = logging.getLogger(__name__)
 
+# Simplified rule-based categories matching the AI categories
+_FALLBACK_CATEGORIES = {
+    'Daily Needs': ['makan', 'minum', 'beras', 'sayur', 'buah', 'daging', 'ikan', 'telur', 'susu', 'roti', 'nasi', 'lauk', 'snack', 'cemilan', 'grocery', 'belanja', 'pasar', 'supermarket'],
+    'Transportation': ['bensin', 'ojek', 'grab', 'gojek', 'taxi', 'bus', 'kereta', 'parkir', 'tol', 'transport'],
+    'Utilities': ['listrik', 'air', 'internet', 'wifi', 'pulsa', 'token', 'pln', 'pdam', 'indihome'],
+    'Health': ['obat', 'dokter', 'rumah sakit', 'rs', 'klinik', 'vitamin', 'medical', 'kesehatan'],
+    'Urgent': ['darurat', 'urgent', 'penting', 'mendadak', 'emergency'],
+    'Entertainment': ['nonton', 'bioskop', 'game', 'musik', 'streaming', 'netflix', 'spotify', 'hiburan', 'jalan', 'mall', 'cafe', 'restaurant', 'film', 'nongkrong'],
+    'Education': ['buku', 'kursus', 'sekolah', 'kuliah', 'les', 'pendidikan'],
+    'Shopping': ['baju', 'sepatu', 'elektronik', 'hp', 'laptop', 'gadget'],
+    'Bills': ['cicilan', 'asuransi', 'pajak', 'tagihan', 'iuran']
+}
+
+_FALLBACK_CLASSIFIER = KeywordClassifier(_FALLBACK_CATEGORIES)
+
 class GeminiCategorizer:
     """AI categorizer using Google Gemini for expense classification"""
     
@@ -50,7 +66,7 @@ class GeminiCategorizer:
             # Extract category from response
             category = self._extract_category_from_response(response.text)
             
-            logger.info(f"AI categorized '{description}' as '{category}'")
+            logger.info("AI categorized '%s' as '%s'", description, category)
             return category
             
         except Exception as e:
@@ -157,28 +173,12 @@ JAWABAN (hanya nama kategori):
     
     def _fallback_classify(self, description: str) -> str:
         """Fallback to rule-based classification when AI is not available"""
-        description_lower = description.lower()
-        
-        # Simplified rule-based categories matching the AI categories
-        categories = {
-            'Daily Needs': ['makan', 'minum', 'beras', 'sayur', 'buah', 'daging', 'ikan', 'telur', 'susu', 'roti', 'nasi', 'lauk', 'snack', 'cemilan', 'grocery', 'belanja', 'pasar', 'supermarket'],
-            'Transportation': ['bensin', 'ojek', 'grab', 'gojek', 'taxi', 'bus', 'kereta', 'parkir', 'tol', 'transport'],
-            'Utilities': ['listrik', 'air', 'internet', 'wifi', 'pulsa', 'token', 'pln', 'pdam', 'indihome'],
-            'Health': ['obat', 'dokter', 'rumah sakit', 'rs', 'klinik', 'vitamin', 'medical', 'kesehatan'],
-            'Urgent': ['darurat', 'urgent', 'penting', 'mendadak', 'emergency'],
-            'Entertainment': ['nonton', 'bioskop', 'game', 'musik', 'streaming', 'netflix', 'spotify', 'hiburan', 'jalan', 'mall', 'cafe', 'restaurant', 'film', 'nongkrong'],
-            'Education': ['buku', 'kursus', 'sekolah', 'kuliah', 'les', 'pendidikan'],
-            'Shopping': ['baju', 'sepatu', 'elektronik', 'hp', 'laptop', 'gadget'],
-            'Bills': ['cicilan', 'asuransi', 'pajak', 'tagihan', 'iuran']
-        }
-        
-        for category, keywords in categories.items():
-            for keyword in keywords:
-                if keyword in description_lower:
-                    logger.info(f"Fallback categorized '{description}' as '{category}' (keyword: {keyword})")
-                    return category
+        category, keyword = _FALLBACK_CLASSIFIER.match(description)
+        if category:
+            logger.info("Fallback categorized '%s' as '%s' (keyword: %s)", description, category, keyword)
+            return category
         
-        logger.info(f"Fallback categorized '{description}' as 'Other' (no matching keywords)")
+        logger.info("Fallback categorized '%s' as 'Other' (no matching keywords)", description)
         return 'Other'
 
 # Global instance
@@ -10,11 +10,21 @@ import sys
 
 def setup_logging():
     """Setup logging configuration"""
+    # No asctime: the process supervisor (Render, systemd, Termux) already
+    # timestamps output, and strftime per record is wasted work
+    level_name = os.getenv('LOG_LEVEL', 'WARNING').upper()
+    level = getattr(logging, level_name, None)
+    valid_level = isinstance(level, int)
+    if not valid_level:
+        level = logging.WARNING
     logging.basicConfig(
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        level=logging.INFO
+        format='%(levelname)s %(name)s %(message)s',
+        level=level
     )
-    return logging.getLogger(__name__)
+    logger = logging.getLogger(__name__)
+    if not valid_level:
+        logger.warning(f"Invalid LOG_LEVEL '{level_name}', using WARNING")
+    return logger
 
 
 def validate_environment():
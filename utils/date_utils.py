@@ -1,29 +1,37 @@
+import time
 from datetime import datetime, timedelta
+from functools import lru_cache
 import pytz
 
+JAKARTA_TZ = pytz.timezone('Asia/Jakarta')
+
+_BULAN_INDO = (
+    "", "Januari", "Februari", "Maret", "April", "Mei", "Juni",
+    "Juli", "Agustus", "September", "Oktober", "November", "Desember"
+)
+_HARI_INDO = (
+    "Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu"
+)
+_BULAN_MAP = {bulan: month for month, bulan in enumerate(_BULAN_INDO) if bulan}
+
+@lru_cache(maxsize=64)
 def format_tanggal_indo(tanggal_str):
     """Format date to Indonesian format"""
-    bulan_indo = [
-        "", "Januari", "Februari", "Maret", "April", "Mei", "Juni",
-        "Juli", "Agustus", "September", "Oktober", "November", "Desember"
-    ]
-    hari_indo = [
-        "Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu"
-    ]
     try:
         dt = datetime.strptime(tanggal_str, "%Y-%m-%d")
-        hari = hari_indo[dt.weekday()]
-        bulan = bulan_indo[dt.month]
+        hari = _HARI_INDO[dt.weekday()]
+        bulan = _BULAN_INDO[dt.month]
         return f"{hari}, {dt.day} {bulan} {dt.year}"
     except Exception:
         return tanggal_str
 
+def format_tanggal_indo_from_dt(dt):
+    """Format a datetime to Indonesian format without a string round trip"""
+    return f"{_HARI_INDO[dt.weekday()]}, {dt.day} {_BULAN_INDO[dt.month]} {dt.year}"
+
+@lru_cache(maxsize=256)
 def parse_tanggal_indo(tanggal_str):
     """Parse Indonesian date format to datetime object"""
-    bulan_map = {
-        'Januari': 1, 'Februari': 2, 'Maret': 3, 'April': 4, 'Mei': 5, 'Juni': 6,
-        'Juli': 7, 'Agustus': 8, 'September': 9, 'Oktober': 10, 'November': 11, 'Desember': 12
-    }
     try:
         parts = tanggal_str.split(',')
         if len(parts) == 2:
@@ -32,25 +40,44 @@ def parse_tanggal_indo(tanggal_str):
             tgl_split = tgl_bulan_tahun.split(' ')
             if len(tgl_split) == 3:
                 hari_num = int(tgl_split[0])
-                bulan_num = bulan_map.get(tgl_split[1], 1)
+                bulan_num = _BULAN_MAP.get(tgl_split[1], 1)
                 tahun_num = int(tgl_split[2])
                 return datetime(tahun_num, bulan_num, hari_num)
         return datetime.strptime(tanggal_str, '%Y-%m-%d')
     except Exception:
         return None
 
+@lru_cache(maxsize=256)
 def get_month_worksheet_name(year, month):
     """Generate worksheet name for specific month"""
-    bulan_indo = [
-        "", "Januari", "Februari", "Maret", "April", "Mei", "Juni",
-        "Juli", "Agustus", "September", "Oktober", "November", "Desember"
-    ]
-    return f"{bulan_indo[month]} {year}"
+    return f"{_BULAN_INDO[month]} {year}"
+
+def parse_month_worksheet_name(name):
+    """Inverse of get_month_worksheet_name: (year, month), or None for other sheet names"""
+    bulan, _, year = name.partition(' ')
+    month = _BULAN_MAP.get(bulan)
+    if not month or not year.isdigit():
+        return None
+    return int(year), month
 
 def get_jakarta_now():
     """Get current datetime in Asia/Jakarta timezone"""
-    jakarta = pytz.timezone('Asia/Jakarta')
-    return datetime.now(jakarta)
+    return datetime.now(JAKARTA_TZ)
+
+def ensure_jakarta_aware(dt):
+    """Return dt as an Asia/Jakarta aware datetime (naive values are taken as Jakarta time)"""
+    if dt.tzinfo is None:
+        return JAKARTA_TZ.localize(dt)
+    return dt.astimezone(JAKARTA_TZ)
+
+@lru_cache(maxsize=1)
+def _jakarta_isoformat(epoch_second):
+    """ISO timestamp for a whole second, memoized so repeated calls are free"""
+    return datetime.fromtimestamp(epoch_second, JAKARTA_TZ).isoformat()
+
+def get_jakarta_timestamp():
+    """Get current Asia/Jakarta time as ISO string (second resolution)"""
+    return _jakarta_isoformat(int(time.time()))
 
 def safe_datetime_compare(dt1, dt2):
     """Safely compare two datetime objects, handling timezone differences"""
@@ -1,10 +1,33 @@
 import logging
+import random
 import time
 from functools import wraps
-from typing import Callable, Any, Tuple
+from typing import Callable, Any, Tuple, Optional
 
 logger = logging.getLogger(__name__)
 
+# HTTP statuses worth retrying; other 4xx (permission, not found, bad request) never succeed on retry
+_TRANSIENT_STATUS = frozenset({429, 500, 502, 503, 504})
+
+def _error_status(error: Exception) -> Optional[int]:
+    """HTTP status of a gspread APIError or googleapiclient HttpError, if any"""
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether a failed Google API call may succeed if retried"""
+    status = _error_status(error)
+    if status is not None:
+        return status in _TRANSIENT_STATUS
+    error_str = str(error).lower()
+    return any(word in error_str for word in ("timeout", "timed out", "quota", "rate", "connection", "network"))
+
 def retry_on_error(max_retries: int = 3, delay: float = 1.0, timeout_delay: float = 5.0):
     """Enhanced decorator untuk retry operasi yang gagal dengan timeout handling"""
     def decorator(func: Callable) -> Callable:
@@ -19,6 +42,10 @@ def retry_on_error(max_retries: int = 3, delay: float = 1.0, timeout_delay: floa
                     last_exception = e
                     error_str = str(e).lower()
                     
+                    # Permanent failures (auth, permission, not found) go straight to the caller
+                    if not is_transient_error(e):
+                        raise
+                    
                     # Log attempt with error type
                     if "timeout" in error_str or "timed out" in error_str:
                         logger.warning(f"Timeout on attempt {attempt + 1} for {func.__name__}: {e}")
@@ -35,6 +62,8 @@ def retry_on_error(max_retries: int = 3, delay: float = 1.0, timeout_delay: floa
                             sleep_time = delay * (3 ** attempt)  # Aggressive backoff for rate limits
                         else:
                             sleep_time = delay * (2 ** attempt)  # Exponential backoff for others
+                        # Jitter so concurrent callers hitting the same limit don't retry in lockstep
+                        sleep_time *= random.uniform(0.5, 1.5)
                         
                         logger.info(f"Waiting {sleep_time:.1f}s before retry {attempt + 2}/{max_retries}")
                         time.sleep(sleep_time)
@@ -80,26 +109,23 @@ class RateLimiter:
         self.time_window = time_window
         self.user_requests = {}
     
-    def is_allowed(self, user_id: str) -> tuple[bool, str]:
+    def is_allowed(self, user_id: int) -> tuple[bool, str]:
         """Check if user is within rate limit"""
         current_time = time.time()
-        user_id_str = str(user_id)
-        
-        if user_id_str not in self.user_requests:
-            self.user_requests[user_id_str] = []
         
         # Remove old requests outside time window
-        self.user_requests[user_id_str] = [
-            req_time for req_time in self.user_requests[user_id_str]
+        requests = [
+            req_time for req_time in self.user_requests.get(user_id, ())
             if current_time - req_time < self.time_window
         ]
+        self.user_requests[user_id] = requests
         
         # Check if within limit
-        if len(self.user_requests[user_id_str]) >= self.max_requests:
+        if len(requests) >= self.max_requests:
             return False, f"⚠️ Terlalu banyak permintaan. Coba lagi dalam {self.time_window} detik."
         
         # Add current request
-        self.user_requests[user_id_str].append(current_time)
+        requests.append(current_time)
         return True, ""
 
 # Global rate limiter instance
@@ -63,14 +63,14 @@ class SimpleCache:
 # Global cache instance
 performance_cache = SimpleCache(default_ttl=180)  # 3 minutes cache
 
-def cache_key_for_user_balance(user_id: str) -> str:
+def cache_key_for_user_balance(user_id: int) -> str:
     """Generate cache key for user balance"""
     return f"balance_{user_id}"
 
-def cache_key_for_worksheet(user_id: str, year: int, month: int) -> str:
+def cache_key_for_worksheet(user_id: int, year: int, month: int) -> str:
     """Generate cache key for worksheet reference"""
     return f"worksheet_{user_id}_{year}_{month}"
 
-def cache_key_for_spreadsheet(user_id: str) -> str:
+def cache_key_for_spreadsheet(user_id: int) -> str:
     """Generate cache key for spreadsheet reference"""
     return f"spreadsheet_{user_id}"
@@ -1,35 +1,53 @@
 import re
 from config import Config
 
+# Amount patterns, compiled once at import
+# Commas are accepted wherever a dot is, so the message text never has to be copied
+_AMOUNT_RE_UNIT = re.compile(r'(\d+(?:[\.,]\d+)?)(?:\s*)(rb|ribu|k|juta)', re.IGNORECASE)
+_AMOUNT_RE_DOTTED = re.compile(r'(\d{1,3}(?:[\.,]\d{3})+)(?![\.,]\d)')  # Matches 15.000.000 but not 1.5
+_AMOUNT_RE_PLAIN = re.compile(r'(\d{4,})')
+_HAS_DIGIT = re.compile(r'\d').search
+_THOUSANDS_DOT_RE = re.compile(r'\.(?=\d{3})')
+
+# Filler words dropped from descriptions, matched case-insensitively
+_REMOVE_WORDS = frozenset({'beli', 'bayar', 'untuk', 'ke', 'di', 'dengan', 'pakai', 'rb', 'ribu', 'k', 'juta'})
+
+# Google OAuth codes are long base64url-ish strings, e.g. "4/0AbC..."
+_OAUTH_CODE_CHARS_RE = re.compile(r'[/_-]')
+
+def looks_like_oauth_code(text):
+    """Cheap check whether a message could be a pasted OAuth authorization code"""
+    return len(text) > 20 and _OAUTH_CODE_CHARS_RE.search(text) is not None
+
 def extract_amount(text):
     """Extract amount from text"""
-    text_lower = text.lower().replace(',', '.')
+    # Most chat messages carry no number at all; skip the amount patterns for them
+    if _HAS_DIGIT(text) is None:
+        return None, None, None
     
     # First try to find numbers with suffixes (rb, ribu, k, juta)
-    suffix_pattern = r'(\d+(?:[\.,]\d+)?)(?:\s*)(rb|ribu|k|juta)'
-    match = re.search(suffix_pattern, text_lower)
+    match = _AMOUNT_RE_UNIT.search(text)
     if match:
         amount_str, satuan = match.groups()
         # Clean up the amount string - remove dots used as thousand separators
-        cleaned_amount = re.sub(r'\.(?=\d{3})', '', amount_str)  # Remove dots before 3 digits
-        amount = float(cleaned_amount.replace(',', '.'))
-        if satuan in ['rb', 'ribu', 'k']:
+        cleaned_amount = _THOUSANDS_DOT_RE.sub('', amount_str.replace(',', '.'))  # Remove dots before 3 digits
+        amount = float(cleaned_amount)
+        satuan = satuan.lower()
+        if satuan in ('rb', 'ribu', 'k'):
             amount *= 1000
         elif satuan == 'juta':
             amount *= 1000000
         return int(amount), match.start(), match.end()
     
     # Try to find numbers with dots (like 15.000.000)
-    dot_pattern = r'(\d{1,3}(?:\.\d{3})+)(?!\.\d)'  # Matches 15.000.000 but not 1.5
-    match = re.search(dot_pattern, text_lower)
+    match = _AMOUNT_RE_DOTTED.search(text)
     if match:
         amount_str = match.group(1)
-        amount = int(amount_str.replace('.', ''))
+        amount = int(amount_str.replace('.', '').replace(',', ''))
         return amount, match.start(), match.end()
     
     # Try to find large plain numbers (4+ digits)
-    plain_pattern = r'(\d{4,})'
-    match = re.search(plain_pattern, text_lower)
+    match = _AMOUNT_RE_PLAIN.search(text)
     if match:
         amount_str = match.group(1)
         amount = int(amount_str)
@@ -37,6 +55,45 @@ def extract_amount(text):
     
     return None, None, None
 
+class KeywordClassifier:
+    """Match text against per-category keyword lists in a single regex pass"""
+    
+    def __init__(self, categories):
+        # categories: {label: [keywords]}; earlier labels win, like a nested loop would
+        self._keywords = {}
+        for rank, (label, keywords) in enumerate(categories.items()):
+            for keyword in keywords:
+                self._keywords.setdefault(keyword, (rank, label))
+        
+        # Lookahead finds overlapping hits; alternatives are ordered by rank so
+        # the best category wins at any position where several keywords start
+        ordered = sorted(self._keywords, key=lambda k: self._keywords[k][0])
+        alternation = '|'.join(re.escape(keyword) for keyword in ordered)
+        self._pattern = re.compile(f'(?=({alternation}))') if ordered else None
+    
+    def match(self, text):
+        """Return (label, keyword) for the highest-priority category found, or (None, None)"""
+        if self._pattern is None:
+            return None, None
+        
+        best_rank, best_keyword = None, None
+        for match in self._pattern.finditer(text.lower()):
+            keyword = match.group(1)
+            rank = self._keywords[keyword][0]
+            if best_rank is None or rank < best_rank:
+                best_rank, best_keyword = rank, keyword
+                if rank == 0:
+                    break
+        
+        if best_keyword is None:
+            return None, None
+        return self._keywords[best_keyword][1], best_keyword
+
+_CATEGORY_CLASSIFIER = KeywordClassifier({
+    category.replace('_', ' ').title(): keywords
+    for category, keywords in Config.CATEGORIES.items()
+})
+
 def classify_category(description):
     """
     Classify expense into category using AI
@@ -56,14 +113,8 @@ def classify_category(description):
 
 def _classify_category_fallback(description):
     """Fallback rule-based classification (legacy method)"""
-    description_lower = description.lower()
-    
-    for category, keywords in Config.CATEGORIES.items():
-        for keyword in keywords:
-            if keyword in description_lower:
-                return category.replace('_', ' ').title()
-    
-    return 'Other'
+    category, _ = _CATEGORY_CLASSIFIER.match(description)
+    return category or 'Other'
 
 def get_description(text, start_pos, end_pos):
     """Extract description by removing amount part"""
@@ -72,8 +123,7 @@ def get_description(text, start_pos, end_pos):
     
     description = (before_amount + ' ' + after_amount).strip()
     
-    remove_words = ['beli', 'bayar', 'untuk', 'ke', 'di', 'dengan', 'pakai', 'rb', 'ribu', 'k', 'juta']
     words = description.split()
-    cleaned_words = [word for word in words if word.lower() not in remove_words]
+    cleaned_words = [word for word in words if word.lower() not in _REMOVE_WORDS]
     
     return ' '.join(cleaned_words).strip() or 'Pengeluaran'